@@ -1,15 +1,314 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import time
 from io import BytesIO
 from datetime import datetime
 
+from procesador.actualizacion import COLUMNAS_POR_DEFECTO, COLUMNAS_PROTEGIDAS, actualizar_agenda, leer_agenda
+from procesador.agenda_nueva import crear_agenda, crear_agenda_por_bloques, leer_partidos
+from procesador.almacen import AlmacenAgendas
+from procesador.cache import CacheContenido, huella
+from procesador.combinacion import (hojas_por_provincia, informe_lecturas, leer_en_paralelo, partidos_combinados,
+                                    seguimiento_combinado, sin_repetidos)
+from procesador.emparejamiento import CLAVE_PARTIDO
+from procesador.exportacion import FORMATOS, exportar, exportar_excel_por_bloques, exportar_excel_por_hojas
+from procesador.indice_seguimiento import cargar_indice
+from procesador.rendimiento import Perfil
+from procesador.trabajos import ERROR, TERMINADO, GestorTrabajos
+
 st.set_page_config(page_title="Procesador de Partidos", page_icon="⚽", layout="wide")
 
 st.title("⚽ Procesador Completo de Partidos de Fútbol")
 
+
+@st.cache_resource
+def obtener_cache():
+    # Una única caché por proceso, compartida entre ejecuciones y sesiones
+    return CacheContenido()
+
+
+@st.cache_resource
+def obtener_gestor():
+    # Pool de trabajos compartido: varias sesiones procesan a la vez sin bloquearse
+    return GestorTrabajos()
+
+
+@st.cache_resource
+def obtener_almacen():
+    # Almacén de agendas versionadas (SQLite local)
+    return AlmacenAgendas()
+
+
+cache = obtener_cache()
+gestor = obtener_gestor()
+almacen = obtener_almacen()
+gestor.limpiar()
+
+# Trabajos en curso que esta ejecución del script está siguiendo (ver el final del script)
+sondeos = []
+
+with st.sidebar:
+    perfilar = st.checkbox(
+        "🔬 Perfilar con cProfile",
+        help="Ejecuta el siguiente proceso bajo cProfile y muestra el informe en el panel Rendimiento"
+    )
+    medir_memoria = st.checkbox(
+        "🧠 Medir memoria por etapa (tracemalloc)",
+        help="Añade el pico de memoria de cada etapa al panel Rendimiento. Hace el proceso varias veces "
+             "más lento: úsalo solo para diagnosticar"
+    )
+
+
+DESCRIPCION_FORMATOS = {
+    'xlsx': "Excel (.xlsx)",
+    'csv': "CSV (;) - más rápido",
+    'parquet': "Parquet - para otras herramientas",
+}
+
+
+def exportar_medido(df, formato, hoja):
+    # Bytes exportados y segundos que ha costado generarlos
+    inicio = time.perf_counter()
+    datos = exportar(df, formato, hoja)
+    return datos, time.perf_counter() - inicio
+
+
+def exportar_provincias_medido(df):
+    # .xlsx con una hoja por provincia y los segundos que ha costado
+    inicio = time.perf_counter()
+    datos = exportar_excel_por_hojas(hojas_por_provincia(df))
+    return datos, time.perf_counter() - inicio
+
+
+def boton_descarga(datos, segundos, formato, nombre, etiqueta):
+    # Se sirve el mismo objeto bytes que guarda la caché, sin copiarlo
+    extension, mime, _ = FORMATOS[formato]
+    col_boton, col_info = st.columns([1, 2])
+    with col_boton:
+        st.download_button(
+            label=f"📥 Descargar {etiqueta}.{extension}",
+            data=datos,
+            file_name=f"{nombre}.{extension}",
+            mime=mime
+        )
+    with col_info:
+        st.caption(f"⏱️ Exportado en {segundos:.2f} s · {len(datos) / 1024 ** 2:.1f} MB")
+
+
+def mostrar_rendimiento(*perfiles):
+    # Panel con las etapas medidas; lo que se sirvió de la caché no aparece
+    etapas = pd.concat([perfil.tabla() for perfil in perfiles], ignore_index=True)
+    total = sum(perfil.segundos for perfil in perfiles)
+    with st.expander(f"⏱️ Rendimiento ({total:.2f} s)"):
+        for perfil in perfiles:
+            for registro in perfil.cruces_multiplicados():
+                st.warning(
+                    f"⚠️ {registro.nombre}: el cruce ha pasado de {registro.filas_entrada} a "
+                    f"{registro.filas_salida} filas (claves repetidas en el seguimiento)"
+                )
+        if len(etapas):
+            st.dataframe(etapas, hide_index=True)
+        else:
+            st.caption("Todo se ha servido de la caché: no se ha ejecutado ninguna etapa.")
+        st.caption(f"Registro JSON: {perfiles[0].ruta_log} · ejecución {', '.join(p.id for p in perfiles)}")
+        for perfil in perfiles:
+            informe = perfil.informe_cprofile()
+            if informe:
+                st.code(informe)
+                st.download_button(
+                    label="📥 Descargar perfil (.pstats)",
+                    data=perfil.datos_cprofile(),
+                    file_name=f"perfil_{perfil.id}.pstats",
+                    mime="application/octet-stream",
+                    key=f"pstats_{perfil.id}"
+                )
+            elif perfil.error_cprofile:
+                st.caption(f"cProfile no disponible: {perfil.error_cprofile}")
+
+
+def agenda_por_bloques(datos_csv, df_seguimiento, trabajo):
+    # Lee el CSV por bloques y escribe la agenda a medida que avanza; solo se
+    # guardan las primeras filas (vista previa) y el número total de filas
+    total_estimado = max(datos_csv.count(b'\n') - 1, 1)
+    vista_previa = []
+    total_registros = 0
+
+    def avanzar(leidas):
+        trabajo.avanzar(leidas / total_estimado, f"{leidas:,} partidos procesados")
+
+    def bloques():
+        nonlocal total_registros
+        for bloque in crear_agenda_por_bloques(BytesIO(datos_csv), df_seguimiento, progreso=avanzar):
+            if not vista_previa:
+                vista_previa.append(bloque.head(10))
+            total_registros += len(bloque)
+            yield bloque
+
+    inicio = time.perf_counter()
+    datos_xlsx = exportar_excel_por_bloques(bloques(), 'Resultado')
+    segundos = time.perf_counter() - inicio
+    return datos_xlsx, segundos, vista_previa[0], total_registros
+
+
+# Etapas de cada proceso, en orden, para calcular el progreso de los trabajos
+ETAPAS_AGENDA_NUEVA = ['leer_csv', 'cargar_indice_seguimiento', 'combinar_seguimiento', 'combinar_partidos',
+                       'cruce_seguimiento', 'visto', 'fechas', 'exportar_xlsx', 'exportar_csv', 'exportar_parquet']
+ETAPAS_ACTUALIZACION = ['actualizar_agenda', 'exportar_xlsx', 'exportar_csv', 'exportar_parquet']
+
+
+def procesar_agenda_nueva(trabajo, archivos_csv, archivos_excel, modo_bloques, formato, por_provincia):
+    # Pestaña 1 completa; se ejecuta en un hilo del gestor, sin llamadas a Streamlit.
+    # ``archivos_*`` son listas de (nombre, bytes, huella) en el orden en que se subieron
+    huellas_csv = tuple(huella_archivo for _, _, huella_archivo in archivos_csv)
+    huellas_excel = tuple(huella_archivo for _, _, huella_archivo in archivos_excel)
+    
+    def avanzar_lectura(que):
+        return lambda hechos, total: trabajo.avanzar(None, f"{hechos}/{total} archivos de {que} leídos")
+    
+    # Leer los CSV a la vez (en modo por bloques se lee más abajo); un archivo que falla no para al resto
+    lecturas_csv = []
+    if not modo_bloques:
+        lecturas_csv = leer_en_paralelo(
+            'leer_csv',
+            [(nombre, (datos, huella_archivo)) for nombre, datos, huella_archivo in archivos_csv],
+            lambda archivo: cache.obtener(
+                ('partidos', archivo[1]), lambda: leer_partidos(BytesIO(archivo[0]), conservar_codigo=True)
+            ),
+            avanzar_lectura('partidos'),
+        )
+    # Cada seguimiento se carga de su índice en disco (solo se relee si cambia el libro)
+    lecturas_excel = leer_en_paralelo(
+        'cargar_indice_seguimiento',
+        [(nombre, (datos, huella_archivo)) for nombre, datos, huella_archivo in archivos_excel],
+        lambda archivo: cache.obtener(('seguimiento', archivo[1]), lambda: cargar_indice(archivo[0])),
+        avanzar_lectura('seguimiento'),
+    )
+    df_seguimiento, duplicados = cache.obtener(
+        ('seguimiento_combinado', huellas_excel), lambda: seguimiento_combinado(lecturas_excel)
+    )
+    
+    # Cruzar partidos con el seguimiento y crear las columnas Técnico, Motivo y Visto
+    df_resultado = None
+    repetidos = 0
+    if modo_bloques:
+        _, datos_csv, huella_csv = archivos_csv[0]
+        datos_exportados, segundos_exportacion, vista_previa, total_registros = cache.obtener(
+            ('agenda_bloques', huella_csv, huellas_excel),
+            lambda: agenda_por_bloques(datos_csv, df_seguimiento, trabajo)
+        )
+    else:
+        df_partidos, repetidos = cache.obtener(
+            ('partidos_combinados', huellas_csv), lambda: partidos_combinados(lecturas_csv)
+        )
+        df_resultado = cache.obtener(
+            ('agenda', huellas_csv, huellas_excel),
+            lambda: crear_agenda(df_partidos, df_seguimiento)
+        )
+        vista_previa = df_resultado.head(10)
+        total_registros = len(df_resultado)
+        
+        # Crear el archivo en memoria (una sola vez por resultado y formato; por bloques ya está escrito)
+        if por_provincia:
+            datos_exportados, segundos_exportacion = cache.obtener(
+                ('xlsx_provincias', huellas_csv, huellas_excel),
+                lambda: exportar_provincias_medido(df_resultado)
+            )
+        else:
+            datos_exportados, segundos_exportacion = cache.obtener(
+                (formato, huellas_csv, huellas_excel, 'Resultado'),
+                lambda: exportar_medido(df_resultado, formato, 'Resultado')
+            )
+    return {
+        'df_resultado': df_resultado,
+        'duplicados': duplicados,
+        'repetidos': repetidos,
+        'informe': informe_lecturas(lecturas_csv, 'Partidos') + informe_lecturas(lecturas_excel, 'Seguimiento'),
+        'vista_previa': vista_previa,
+        'total_registros': total_registros,
+        'datos': datos_exportados,
+        'segundos_exportacion': segundos_exportacion,
+    }
+
+
+def procesar_actualizacion(trabajo, clave_actualizacion, df_base, df_nuevo, columnas, columna_id, aproximada,
+                           formato):
+    # Pestaña 2: actualización y exportación; se ejecuta en un hilo del gestor
+    df_actualizado, stats = cache.obtener(
+        clave_actualizacion,
+        lambda: actualizar_agenda(df_base, df_nuevo, columnas, columna_id, aproximada)
+    )
+    
+    # Crear archivo para descarga (una sola vez por resultado y formato)
+    datos_exportados, segundos_exportacion = cache.obtener(
+        clave_actualizacion + (formato, 'Agenda_Actualizada'),
+        lambda: exportar_medido(df_actualizado, formato, 'Agenda_Actualizada')
+    )
+    return {
+        'df_actualizado': df_actualizado,
+        'stats': stats,
+        'datos': datos_exportados,
+        'segundos_exportacion': segundos_exportacion,
+    }
+
+
+def seguir_trabajo(ranura, clave, lanzar, funcion, *args, etapas=(), reintentar=False):
+    # Devuelve lo guardado en la sesión para ``clave`` (resultado, error o cancelación).
+    # Si no hay nada, lanza el trabajo (si ``lanzar``) o muestra el progreso del que
+    # está en curso y devuelve None. Un trabajo en curso no se cancela porque cambie
+    # un widget: solo si se lanza otro en la misma ranura.
+    clave_resultado = f'resultado_{ranura}'
+    clave_trabajo = f'trabajo_{ranura}'
+    guardado = st.session_state.get(clave_resultado)
+    if guardado is not None and guardado['clave'] == clave:
+        if guardado['estado'] == TERMINADO or not reintentar:
+            return guardado
+        del st.session_state[clave_resultado]
+    
+    trabajo = gestor.obtener(st.session_state.get(clave_trabajo))
+    if lanzar and (trabajo is None or trabajo.clave != clave):
+        if trabajo is not None:
+            trabajo.cancelar()
+            gestor.retirar(trabajo.id)
+        trabajo = gestor.enviar(ranura, funcion, *args, clave=clave, etapas=etapas, cprofile=perfilar,
+                                memoria=medir_memoria)
+        st.session_state[clave_trabajo] = trabajo.id
+    if trabajo is None:
+        return None
+    
+    if not trabajo.terminado:
+        st.progress(trabajo.progreso, text=f"⏳ {trabajo.mensaje}")
+        if st.button("✖️ Cancelar", key=f'cancelar_{ranura}'):
+            trabajo.cancelar()
+        sondeos.append(trabajo.id)
+        return None
+    
+    # Terminado: el resultado pasa a la sesión y el gestor lo olvida
+    gestor.retirar(trabajo.id)
+    st.session_state.pop(clave_trabajo, None)
+    st.session_state[clave_resultado] = {
+        'clave': trabajo.clave,
+        'estado': trabajo.estado,
+        'resultado': trabajo.resultado,
+        'error': trabajo.error,
+        'perfil': trabajo.perfil,
+    }
+    return st.session_state[clave_resultado] if trabajo.clave == clave else None
+
+
+def mostrar_fallo(ranura, guardado, texto_error, ayuda):
+    # Error o cancelación guardados: no se reintenta solo en cada ejecución del script
+    if guardado['estado'] == ERROR:
+        st.error(f"❌ {texto_error}: {guardado['error']}")
+        st.info(ayuda)
+    else:
+        st.warning("⏹️ Proceso cancelado")
+    if st.button("🔁 Volver a procesar", key=f'reintentar_{ranura}'):
+        del st.session_state[f'resultado_{ranura}']
+        st.rerun()
+
 # Crear tabs para las diferentes funcionalidades
-tab1, tab2 = st.tabs(["📋 Procesar Partidos Nuevos", "🔄 Actualizar Agenda Existente"])
+tab1, tab2, tab3 = st.tabs(["📋 Procesar Partidos Nuevos", "🔄 Actualizar Agenda Existente", "🗂️ Almacén de Agendas"])
 
 # =============================================================================
 # TAB 1: PROCESAMIENTO DE PARTIDOS NUEVOS
@@ -23,146 +322,123 @@ with tab1:
 
     with col1:
         st.subheader("📄 Lista de Partidos (CSV)")
-        uploaded_csv = st.file_uploader(
-            "Sube el archivo ListaPartidos.csv", 
+        uploaded_csvs = st.file_uploader(
+            "Sube uno o varios ListaPartidos.csv (p. ej. uno por competición o provincia)", 
             type=['csv'],
+            accept_multiple_files=True,
             key="csv_file"
         )
 
     with col2:
         st.subheader("📊 Seguimiento Ligas (Excel)")
-        uploaded_excel = st.file_uploader(
-            "Sube el archivo Seguimiento_ligas.xlsm", 
+        uploaded_excels = st.file_uploader(
+            "Sube el archivo Seguimiento_ligas.xlsm (o varios)", 
             type=['xlsx', 'xlsm'],
-            key="excel_file"
+            accept_multiple_files=True,
+            key="excel_file",
+            help="Si un club está en varios libros, vale el del primero que se subió"
         )
 
-    if uploaded_csv is not None and uploaded_excel is not None:
-        try:
-            with st.spinner('Procesando archivos...'):
-                
-                # Leer el archivo CSV
-                # - dtype=str en Competición/Grupo: evita que pandas los infiera como int/float
-                #   y rompa la concatenación de más abajo.
-                # - index_col=False: el CSV trae un ';' de más al final de cada fila (18 campos
-                #   contra 17 cabeceras). Sin esto, pandas usa la 1ª columna como índice y
-                #   desplaza todos los datos una columna a la izquierda.
-                lect_partidos = pd.read_csv(
-                    uploaded_csv, encoding="latin1", on_bad_lines='skip', sep=';',
-                    dtype={'Competición': str, 'Grupo': str},
-                    index_col=False,
-                )
-                # Si el separador de más generó una columna sin nombre al final, descártala.
-                lect_partidos = lect_partidos.loc[:, ~lect_partidos.columns.astype(str).str.startswith('Unnamed')]
-                
-                # Crear DataFrame de partidos
-                df_partidos = lect_partidos.drop(columns=['Club Casa', 'Club Visitante', 'Equipo Casa', 'Equipo Visitante',
-                                                         'Resultado', 'Código Partido', 'Árbitro'], errors='ignore')
-                
-                # Extraer la provincia de la columna 'Competición'
-                df_partidos['Provincia'] = df_partidos['Competición'].str.extract(r'\((.*?)\)')
-                
-                # Concatenar 'Competición' y 'Grupo' en una nueva columna
-                df_partidos['Competicion'] = df_partidos['Competición'] + ", " + df_partidos['Grupo']
-                
-                # Eliminar las columnas originales 'Competición' y 'Grupo'
-                df_partidos = df_partidos.drop(columns=['Competición', 'Grupo'], errors='ignore')
-                
-                # Leer el archivo de Excel
-                lect_seguimiento = pd.read_excel(uploaded_excel)
-                
-                # Eliminar las primeras 5 filas
-                df_seguimiento = lect_seguimiento.drop(index=lect_seguimiento.index[:5])
-                
-                # Renombrar columnas relevantes (por posición; reasignar la lista entera para compatibilidad con pandas 2.x)
-                new_cols = df_seguimiento.columns.tolist()
-                if len(new_cols) <= 36:
-                    raise ValueError(
-                        f"El Excel de seguimiento tiene {len(new_cols)} columnas tras quitar las 5 primeras filas; "
-                        "se esperaban al menos 37 (Visualización C en col 37, Detalles Equipo Casa en col 36)."
-                    )
-                new_cols[0] = 'Competicion'
-                new_cols[2] = 'Nombre Club Casa'
-                new_cols[35] = 'Detalles Equipo Casa'
-                new_cols[36] = 'Visualización C'
-                df_seguimiento.columns = new_cols
-                
-                # Seleccionar columnas necesarias
-                df_seguimiento = df_seguimiento[['Competicion', 'Nombre Club Casa', 'Visualización C', 'Detalles Equipo Casa']]
-                
-                # Realizar la primera unión
-                resultado_casa = pd.merge(df_partidos, df_seguimiento, on=['Competicion', 'Nombre Club Casa'], how='left')
-                
-                # Preparar DataFrame para equipos visitantes
-                df_visitante = df_seguimiento.copy()
-                df_visitante.columns = ['Competicion', 'Nombre Club Visitante', 'Visualización V', 'Detalles Equipo Visitante']
-                
-                # Realizar la segunda unión
-                resultado = pd.merge(resultado_casa, df_visitante, on=['Competicion', 'Nombre Club Visitante'], how='left')
-                
-                # ¡AQUÍ ES DONDE SE CREAN LAS NUEVAS COLUMNAS!
-                # Agregar las columnas de técnico y motivo al inicio (vacías)
-                resultado['Técnico'] = ''  # Columna A - vacía para que puedas llenarla
-                resultado['Motivo'] = ''   # Columna B - vacía para que puedas llenarla
-                
-                # Agregar la columna "Visto" calculada (Columna C)
-                # Replica la fórmula de Excel: =SI(Y(J2<>""; M2<>""); "Rellenas"; "Incompletas")
-                # Donde J = "Visualización C" y M = "Visualización V"
-                def calcular_visto(row):
-                    vis_c = row.get('Visualización C', '')
-                    vis_v = row.get('Visualización V', '')
-                    
-                    # Convertir a string para manejar NaN y otros tipos
-                    vis_c_str = str(vis_c) if pd.notna(vis_c) else ''
-                    vis_v_str = str(vis_v) if pd.notna(vis_v) else ''
-                    
-                    # Aplicar la lógica exacta de Excel: Y(J2<>""; M2<>"")
-                    if vis_c_str != '' and vis_v_str != '':
-                        return 'Rellenas'
-                    else:
-                        return 'Incompletas'
-                
-                resultado['Visto'] = resultado.apply(calcular_visto, axis=1)
-                
-                # Establecer orden en las columnas del dataframe (AHORA con las nuevas columnas primero)
-                nuevo_orden = ['Técnico', 'Motivo', 'Visto', 'Fecha', 'Hora', 'Jornada', 'Competicion', 'Provincia', 'Nombre Club Casa',
-                              'Visualización C', 'Detalles Equipo Casa', 'Nombre Club Visitante',
-                              'Visualización V', 'Detalles Equipo Visitante', 'Campo', 'Dirección Campo']
-                
-                df_resultado = resultado[nuevo_orden]
-                
-                # Convertir la columna 'Fecha' a formato datetime
-                df_resultado['Fecha'] = pd.to_datetime(df_resultado['Fecha'], errors='coerce', dayfirst=True)
-                
-                # Aplicar el formato de fecha deseado
-                df_resultado['Fecha'] = df_resultado['Fecha'].dt.strftime('%d/%m/%Y')
+    varios_csv = len(uploaded_csvs) > 1
+    modo_bloques = st.checkbox(
+        "🧱 Procesar por bloques (para ListaPartidos muy grandes)",
+        disabled=varios_csv,
+        help="Lee el CSV en bloques de 50.000 partidos y va escribiendo la agenda: la memoria no crece con "
+             "el tamaño del archivo. La vista previa muestra solo las primeras filas. Solo con un CSV."
+    ) and not varios_csv
+    col1, col2 = st.columns(2)
+    with col1:
+        formato_nueva = st.radio(
+            "Formato de descarga",
+            list(FORMATOS),
+            format_func=DESCRIPCION_FORMATOS.get,
+            horizontal=True,
+            key="formato_nueva",
+            disabled=modo_bloques,
+            help="Por bloques la agenda se escribe directamente en Excel"
+        )
+    if modo_bloques:
+        formato_nueva = 'xlsx'
+    with col2:
+        por_provincia = st.radio(
+            "Salida",
+            ["Una agenda", "Una hoja por provincia"],
+            horizontal=True,
+            key="salida_nueva",
+            disabled=modo_bloques or formato_nueva != 'xlsx',
+            help="Solo en Excel y sin procesar por bloques"
+        ) == "Una hoja por provincia" and not modo_bloques and formato_nueva == 'xlsx'
+
+    if uploaded_csvs and uploaded_excels:
+        # Identificar los archivos por su contenido para reutilizar lo ya procesado
+        archivos_csv = [(archivo.name, archivo.getvalue()) for archivo in uploaded_csvs]
+        archivos_excel = [(archivo.name, archivo.getvalue()) for archivo in uploaded_excels]
+        archivos_csv = [(nombre, datos, huella(datos)) for nombre, datos in archivos_csv]
+        archivos_excel = [(nombre, datos, huella(datos)) for nombre, datos in archivos_excel]
+        # Un libro repetido no aporta nada (vale el primero) y se leería dos veces a la vez
+        archivos_excel, excel_repetidos = sin_repetidos(archivos_excel)
+        if excel_repetidos:
+            st.info(f"🔁 Se ignoran los libros de seguimiento repetidos: {', '.join(excel_repetidos)}")
+        clave_nueva = (
+            'nueva',
+            tuple(huella_archivo for _, _, huella_archivo in archivos_csv),
+            tuple(huella_archivo for _, _, huella_archivo in archivos_excel),
+            modo_bloques, formato_nueva, por_provincia,
+        )
+        
+        # El proceso corre en segundo plano; el resultado queda en la sesión para las siguientes ejecuciones
+        guardado = seguir_trabajo(
+            'nueva', clave_nueva, True,
+            procesar_agenda_nueva, archivos_csv, archivos_excel, modo_bloques, formato_nueva, por_provincia,
+            etapas=ETAPAS_AGENDA_NUEVA
+        )
+        
+        if guardado is not None and guardado['estado'] != TERMINADO:
+            mostrar_fallo(
+                'nueva', guardado, "Error al procesar los archivos",
+                "Verifica que los archivos tengan el formato correcto y las columnas esperadas."
+            )
+        elif guardado is not None:
+            resultado = guardado['resultado']
+            duplicados = resultado['duplicados']
             
             # Mostrar preview de los resultados
             st.success("✅ Archivos procesados correctamente!")
-            st.subheader("👀 Vista previa del resultado")
-            st.dataframe(df_resultado.head(10))
             
-            st.info(f"📊 Total de registros procesados: {len(df_resultado)}")
+            if len(duplicados):
+                st.warning(
+                    f"⚠️ El Excel de seguimiento tiene {len(duplicados)} combinaciones Competición/Club repetidas: "
+                    "los partidos de esos clubes aparecerán duplicados en la agenda."
+                )
+                with st.expander("Ver claves duplicadas"):
+                    st.dataframe(duplicados)
+            
+            # Tiempo, filas y errores de cada archivo: uno que falla no impide procesar el resto
+            informe = pd.DataFrame(resultado['informe'])
+            fallidos = informe['Estado'].str.startswith('❌').sum()
+            if fallidos:
+                st.warning(f"⚠️ {fallidos} archivo(s) no se han podido leer y se han dejado fuera")
+            if resultado['repetidos']:
+                st.info(f"🔁 {resultado['repetidos']} partidos repetidos entre archivos (mismo Código Partido) eliminados")
+            with st.expander(f"📂 Archivos leídos ({len(informe)})", expanded=bool(fallidos)):
+                st.dataframe(informe, hide_index=True)
             
-            # Crear el archivo Excel en memoria
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df_resultado.to_excel(writer, sheet_name='Resultado', index=False)
+            st.subheader("👀 Vista previa del resultado")
+            st.dataframe(resultado['vista_previa'])
+            
+            st.info(f"📊 Total de registros procesados: {resultado['total_registros']}")
             
             # Botón de descarga
-            st.download_button(
-                label="📥 Descargar agenda_nueva.xlsx",
-                data=output.getvalue(),
-                file_name="agenda_nueva.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            boton_descarga(
+                resultado['datos'], resultado['segundos_exportacion'], formato_nueva,
+                "agenda_por_provincia" if por_provincia else "agenda_nueva",
+                "agenda_por_provincia" if por_provincia else "agenda_nueva"
             )
             
-        except Exception as e:
-            st.error(f"❌ Error al procesar los archivos: {str(e)}")
-            st.info("Verifica que los archivos tengan el formato correcto y las columnas esperadas.")
+            mostrar_rendimiento(guardado['perfil'])
 
     else:
-        st.info("👆 Sube ambos archivos para comenzar el procesamiento")
+        st.info("👆 Sube al menos un CSV de partidos y un Excel de seguimiento para comenzar el procesamiento")
 
 
 # =============================================================================
@@ -197,10 +473,16 @@ with tab2:
     if archivo_base is not None and archivo_nuevo is not None:
         st.subheader("⚙️ Configuración de Actualización")
         
-        # Leer archivos para mostrar columnas disponibles
+        # Leer archivos para mostrar columnas disponibles (se reutilizan al actualizar)
         try:
-            df_base_preview = pd.read_excel(archivo_base)
-            df_nuevo_preview = pd.read_excel(archivo_nuevo)
+            datos_base = archivo_base.getvalue()
+            datos_nuevo = archivo_nuevo.getvalue()
+            huella_base = huella(datos_base)
+            huella_nuevo = huella(datos_nuevo)
+            perfil_lectura = Perfil('leer_agendas')
+            with perfil_lectura:
+                df_base_preview = cache.obtener(('agenda_excel', huella_base), lambda: leer_agenda(BytesIO(datos_base)))
+                df_nuevo_preview = cache.obtener(('agenda_excel', huella_nuevo), lambda: leer_agenda(BytesIO(datos_nuevo)))
             
             col1, col2 = st.columns(2)
             
@@ -217,12 +499,12 @@ with tab2:
             columnas_comunes = list(set(df_base_preview.columns) & set(df_nuevo_preview.columns))
             
             # Excluir columnas importantes que NO deben actualizarse
-            columnas_protegidas = ['Técnico', 'Motivo', 'Visto']
+            columnas_protegidas = COLUMNAS_PROTEGIDAS
             columnas_disponibles = [col for col in columnas_comunes if col not in columnas_protegidas]
             
             # Preseleccionar columnas típicas
             columnas_por_defecto = []
-            for col in ['Fecha', 'Hora', 'Campo', 'Dirección Campo']:
+            for col in COLUMNAS_POR_DEFECTO:
                 if col in columnas_disponibles:
                     columnas_por_defecto.append(col)
             
@@ -240,166 +522,256 @@ with tab2:
             
             # Selección de columna ID
             st.subheader("🆔 Columna para identificar partidos")
+            opcion_compuesta = f"Clave compuesta ({', '.join(CLAVE_PARTIDO)})"
+            opciones_id = ["Usar posición de fila"] + columnas_comunes
+            if set(CLAVE_PARTIDO) <= set(columnas_comunes):
+                opciones_id.insert(0, opcion_compuesta)
             columna_id = st.selectbox(
                 "Selecciona la columna que identifica únicamente cada partido:",
-                ["Usar posición de fila"] + columnas_comunes,
-                help="Esta columna se usa para saber qué partido corresponde a cuál entre los dos archivos"
+                opciones_id,
+                help="Esta columna se usa para saber qué partido corresponde a cuál entre los dos archivos. "
+                     "La clave compuesta no se descoloca si se añaden o quitan partidos."
             )
             
             if columna_id == "Usar posición de fila":
                 columna_id = None
+            elif columna_id == opcion_compuesta:
+                columna_id = tuple(CLAVE_PARTIDO)
+            
+            aproximada = st.checkbox(
+                "🧩 Emparejar por parecido los partidos que queden sin pareja",
+                help="Compara solo partidos de la misma competición y jornada (p. ej. un club escrito "
+                     "con o sin tilde)"
+            )
+            
+            formato_actualizada = st.radio(
+                "Formato de descarga",
+                list(FORMATOS),
+                format_func=DESCRIPCION_FORMATOS.get,
+                horizontal=True,
+                key="formato_actualizada"
+            )
             
             # Botón para procesar
-            if st.button("🚀 Actualizar Agenda", type="primary"):
-                if not columnas_seleccionadas:
-                    st.error("❌ Debes seleccionar al menos una columna para actualizar")
-                else:
-                    try:
-                        with st.spinner('🔄 Actualizando agenda...'):
-                            
-                            # Función de actualización integrada
-                            def actualizar_agenda(df_martes, df_miercoles, columnas_a_actualizar, columna_id):
-                                # Crear copia del archivo del martes como base
-                                df_resultado = df_martes.copy()
-                                
-                                # Si no hay columna ID, crear una basada en la posición
-                                if not columna_id:
-                                    columna_id = '_posicion_fila'
-                                    df_martes[columna_id] = df_martes.index
-                                    df_miercoles[columna_id] = df_miercoles.index
-                                    df_resultado[columna_id] = df_resultado.index
-                                
-                                # Estadísticas
-                                partidos_actualizados = 0
-                                partidos_sin_match = 0
-                                columnas_actualizadas = {col: 0 for col in columnas_a_actualizar}
-                                
-                                # Crear diccionario del archivo del martes para búsqueda rápida
-                                dict_martes = {}
-                                for idx, row in df_resultado.iterrows():
-                                    key = str(row[columna_id])
-                                    dict_martes[key] = idx
-                                
-                                # Actualizar cada partido del miércoles
-                                for _, row_miercoles in df_miercoles.iterrows():
-                                    key = str(row_miercoles[columna_id])
-                                    
-                                    if key in dict_martes:
-                                        idx_martes = dict_martes[key]
-                                        partido_actualizado = False
-                                        
-                                        # Actualizar solo las columnas especificadas
-                                        for columna in columnas_a_actualizar:
-                                            if columna in df_miercoles.columns:
-                                                valor_nuevo = row_miercoles[columna]
-                                                valor_anterior = df_resultado.loc[idx_martes, columna]
-                                                
-                                                # Solo actualizar si hay cambio
-                                                if pd.isna(valor_anterior) and pd.isna(valor_nuevo):
-                                                    continue
-                                                elif valor_anterior != valor_nuevo:
-                                                    df_resultado.loc[idx_martes, columna] = valor_nuevo
-                                                    columnas_actualizadas[columna] += 1
-                                                    partido_actualizado = True
-                                        
-                                        if partido_actualizado:
-                                            partidos_actualizados += 1
-                                            df_resultado.loc[idx_martes, 'Ultima_Actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                                            
-                                            # Recalcular el campo "Visto" usando la fórmula de Excel exacta
-                                            if 'Visto' in df_resultado.columns:
-                                                vis_c = df_resultado.loc[idx_martes, 'Visualización C'] if 'Visualización C' in df_resultado.columns else ''
-                                                vis_v = df_resultado.loc[idx_martes, 'Visualización V'] if 'Visualización V' in df_resultado.columns else ''
-                                                
-                                                # Convertir a string para manejar NaN
-                                                vis_c_str = str(vis_c) if pd.notna(vis_c) else ''
-                                                vis_v_str = str(vis_v) if pd.notna(vis_v) else ''
-                                                
-                                                # Aplicar fórmula Excel: =SI(Y(J2<>""; M2<>""); "Rellenas"; "Incompletas")
-                                                if vis_c_str != '' and vis_v_str != '':
-                                                    df_resultado.loc[idx_martes, 'Visto'] = 'Rellenas'
-                                                else:
-                                                    df_resultado.loc[idx_martes, 'Visto'] = 'Incompletas'
-                                    else:
-                                        partidos_sin_match += 1
-                                
-                                # Limpiar columna temporal si la creamos
-                                if columna_id == '_posicion_fila':
-                                    df_resultado = df_resultado.drop(columna_id, axis=1)
-                                
-                                return df_resultado, {
-                                    'partidos_actualizados': partidos_actualizados,
-                                    'partidos_sin_match': partidos_sin_match,
-                                    'columnas_actualizadas': columnas_actualizadas
-                                }
-                            
-                            # Cargar archivos
-                            df_base = pd.read_excel(archivo_base)
-                            df_nuevo = pd.read_excel(archivo_nuevo)
-                            
-                            # Ejecutar actualización
-                            df_actualizado, stats = actualizar_agenda(
-                                df_base, df_nuevo, columnas_seleccionadas, columna_id
-                            )
-                        
-                        # Mostrar resultados
-                        st.success("✅ Agenda actualizada correctamente!")
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("🎯 Partidos actualizados", stats['partidos_actualizados'])
-                        with col2:
-                            st.metric("❓ Sin correspondencia", stats['partidos_sin_match'])
-                        with col3:
-                            st.metric("📊 Total partidos", len(df_actualizado))
-                        
-                        st.subheader("📈 Cambios por columna")
-                        for columna, cambios in stats['columnas_actualizadas'].items():
-                            st.write(f"**{columna}**: {cambios} cambios")
-                        
-                        # Vista previa
-                        st.subheader("👀 Vista previa del resultado")
-                        st.dataframe(df_actualizado.head(10))
-                        
-                        # Crear archivo para descarga
-                        output_actualizado = BytesIO()
-                        with pd.ExcelWriter(output_actualizado, engine='xlsxwriter') as writer:
-                            df_actualizado.to_excel(writer, sheet_name='Agenda_Actualizada', index=False)
-                        
-                        # Botón de descarga
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-                        st.download_button(
-                            label="📥 Descargar agenda_actualizada.xlsx",
-                            data=output_actualizado.getvalue(),
-                            file_name=f"agenda_actualizada_{timestamp}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error al actualizar la agenda: {str(e)}")
-                        st.info("Verifica que ambos archivos tengan el formato correcto.")
-        
+            lanzar = st.button("🚀 Actualizar Agenda", type="primary")
+            if lanzar and not columnas_seleccionadas:
+                st.error("❌ Debes seleccionar al menos una columna para actualizar")
+                lanzar = False
+            
+            # La actualización corre en segundo plano (los archivos ya se leyeron para la vista de columnas);
+            # el resultado queda en la sesión y se reutiliza mientras no cambie la configuración
+            clave_actualizacion = (
+                'actualizacion', huella_base, huella_nuevo,
+                tuple(columnas_seleccionadas), columna_id, aproximada
+            )
+            guardado = seguir_trabajo(
+                'actualizacion', clave_actualizacion + (formato_actualizada,), lanzar,
+                procesar_actualizacion, clave_actualizacion, df_base_preview, df_nuevo_preview,
+                columnas_seleccionadas, columna_id, aproximada, formato_actualizada,
+                etapas=ETAPAS_ACTUALIZACION, reintentar=lanzar
+            )
+            
+            if guardado is not None and guardado['estado'] != TERMINADO:
+                mostrar_fallo(
+                    'actualizacion', guardado, "Error al actualizar la agenda",
+                    "Verifica que ambos archivos tengan el formato correcto."
+                )
+            elif guardado is not None:
+                resultado = guardado['resultado']
+                df_actualizado = resultado['df_actualizado']
+                stats = resultado['stats']
+                
+                # Mostrar resultados
+                st.success("✅ Agenda actualizada correctamente!")
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("🎯 Partidos actualizados", stats['partidos_actualizados'])
+                with col2:
+                    st.metric("❓ Sin correspondencia", stats['partidos_sin_match'])
+                with col3:
+                    st.metric("📊 Total partidos", len(df_actualizado))
+                
+                repetidas = stats['claves_repetidas']
+                if repetidas['actual'] or repetidas['nueva']:
+                    st.warning(
+                        f"⚠️ Claves repetidas: {repetidas['actual']} en la agenda actual y {repetidas['nueva']} "
+                        "en la nueva. Con clave compuesta se emparejan por orden de aparición; con una columna "
+                        "todas apuntan a la última fila repetida."
+                    )
+                
+                st.subheader("🔗 Correspondencias por estrategia")
+                nombres_estrategia = {
+                    'posicion': "📍 Por posición",
+                    'columna': "🆔 Por columna",
+                    'clave_compuesta': "🔑 Clave compuesta",
+                    'aproximada': "🧩 Aproximadas",
+                }
+                estrategias = stats['coincidencias_por_estrategia']
+                for col, (estrategia, cuenta) in zip(st.columns(len(estrategias)), estrategias.items()):
+                    with col:
+                        st.metric(nombres_estrategia[estrategia], cuenta)
+                
+                st.subheader("📈 Cambios por columna")
+                for columna, cambios in stats['columnas_actualizadas'].items():
+                    st.write(f"**{columna}**: {cambios} cambios")
+                
+                # Vista previa
+                st.subheader("👀 Vista previa del resultado")
+                st.dataframe(df_actualizado.head(10))
+                
+                # Botón de descarga
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+                boton_descarga(
+                    resultado['datos'], resultado['segundos_exportacion'], formato_actualizada,
+                    f"agenda_actualizada_{timestamp}", "agenda_actualizada"
+                )
+                
+                mostrar_rendimiento(perfil_lectura, guardado['perfil'])
+                
         except Exception as e:
             st.error(f"❌ Error al leer los archivos: {str(e)}")
     
     else:
         st.info("👆 Sube ambos archivos para configurar la actualización")
 
+
+# =============================================================================
+# TAB 3: ALMACÉN DE AGENDAS VERSIONADAS
+# =============================================================================
+with tab3:
+    st.header("🗂️ Almacén de Agendas")
+    st.markdown(
+        "Guarda la agenda una vez y aplica cada día solo los cambios: cada versión registra las celdas "
+        "modificadas y cualquier versión o competición se puede exportar sin volver a subir Excel."
+    )
+    
+    try:
+        df_agendas = almacen.agendas()
+        nombres_agendas = df_agendas['agenda'].tolist()
+        if nombres_agendas:
+            st.dataframe(df_agendas, hide_index=True)
+        else:
+            st.info("📭 Todavía no hay agendas guardadas")
+        
+        # Guardar una agenda nueva o una nueva versión con el trabajo hecho en Excel
+        st.subheader("💾 Guardar agenda")
+        col1, col2 = st.columns(2)
+        with col1:
+            nombre_guardar = st.text_input(
+                "Nombre de la agenda",
+                help="Si ya existe, se guardan como nueva versión las celdas que cambien (p. ej. técnicos asignados)"
+            )
+        with col2:
+            archivo_guardar = st.file_uploader("Agenda (.xlsx)", type=['xlsx', 'xlsm'], key="archivo_guardar")
+        if st.button("💾 Guardar versión", disabled=not (nombre_guardar and archivo_guardar)):
+            with st.spinner('Guardando...'):
+                df_guardar = leer_agenda(BytesIO(archivo_guardar.getvalue()))
+                version = almacen.guardar(nombre_guardar, df_guardar)
+            st.success(f"✅ '{nombre_guardar}' guardada como versión {version}")
+        
+        if nombres_agendas:
+            # Actualizar la versión actual con una agenda nueva, guardando solo los cambios
+            st.subheader("🔄 Aplicar agenda nueva")
+            col1, col2 = st.columns(2)
+            with col1:
+                agenda_actualizar = st.selectbox("Agenda a actualizar", nombres_agendas, key="agenda_actualizar")
+            with col2:
+                archivo_delta = st.file_uploader("Agenda nueva (.xlsx)", type=['xlsx', 'xlsm'], key="archivo_delta")
+            columnas_delta = st.multiselect(
+                "Columnas a actualizar:",
+                COLUMNAS_POR_DEFECTO,
+                default=COLUMNAS_POR_DEFECTO,
+                key="columnas_delta"
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                usar_clave = st.checkbox(f"Emparejar por {', '.join(CLAVE_PARTIDO)}", value=True)
+            with col2:
+                aproximada_delta = st.checkbox("Emparejar por parecido lo que quede sin pareja", key="aproximada_delta")
+            if st.button("🚀 Aplicar cambios", disabled=not (archivo_delta and columnas_delta)):
+                with st.spinner('Aplicando cambios...'):
+                    df_delta = leer_agenda(BytesIO(archivo_delta.getvalue()))
+                    _, stats_delta, version = almacen.actualizar(
+                        agenda_actualizar, df_delta, columnas_delta,
+                        tuple(CLAVE_PARTIDO) if usar_clave else None, aproximada_delta
+                    )
+                if version is None:
+                    st.info("Sin cambios: no se ha creado ninguna versión")
+                else:
+                    st.success(
+                        f"✅ Versión {version}: {stats_delta['partidos_actualizados']} partidos actualizados, "
+                        f"{stats_delta['partidos_sin_match']} sin correspondencia"
+                    )
+            
+            # Historial y exportación de cualquier versión o trozo de la agenda
+            st.subheader("📜 Historial y exportación")
+            agenda_historial = st.selectbox("Agenda", nombres_agendas, key="agenda_historial")
+            historial = almacen.historial(agenda_historial)
+            st.dataframe(historial, hide_index=True)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                version_exportar = st.selectbox(
+                    "Versión", historial['version'].tolist()[::-1], key="version_exportar"
+                )
+            bloques_agenda = almacen.bloques(agenda_historial)
+            with col2:
+                competicion_exportar = st.selectbox(
+                    "Competición", [None] + sorted(bloques_agenda['competicion'].dropna().unique().tolist()),
+                    format_func=lambda valor: "Todas" if valor is None else valor, key="competicion_exportar"
+                )
+            with col3:
+                jornadas = bloques_agenda
+                if competicion_exportar is not None:
+                    jornadas = jornadas[jornadas['competicion'] == competicion_exportar]
+                jornada_exportar = st.selectbox(
+                    "Jornada", [None] + sorted(jornadas['jornada'].dropna().unique().tolist()),
+                    format_func=lambda valor: "Todas" if valor is None else valor, key="jornada_exportar"
+                )
+            
+            with st.expander(f"Ver celdas cambiadas en la versión {version_exportar}"):
+                st.dataframe(almacen.cambios(agenda_historial, version_exportar), hide_index=True)
+            
+            formato_almacen = st.radio(
+                "Formato de descarga",
+                list(FORMATOS),
+                format_func=DESCRIPCION_FORMATOS.get,
+                horizontal=True,
+                key="formato_almacen"
+            )
+            if st.button("📦 Preparar descarga"):
+                with st.spinner('Exportando...'):
+                    df_version = almacen.cargar(
+                        agenda_historial, version_exportar, competicion_exportar, jornada_exportar
+                    )
+                    datos_version, segundos_version = exportar_medido(
+                        df_version.reset_index(drop=True), formato_almacen, 'Agenda'
+                    )
+                st.info(f"📊 {len(df_version)} partidos")
+                boton_descarga(
+                    datos_version, segundos_version, formato_almacen,
+                    f"{agenda_historial}_v{version_exportar}", agenda_historial
+                )
+    
+    except Exception as e:
+        st.error(f"❌ Error en el almacén de agendas: {str(e)}")
+
 # Información adicional en la sidebar
 with st.sidebar:
     st.header("ℹ️ Guía de Uso")
     
     st.subheader("📋 Procesar Partidos Nuevos")
     st.markdown("""
-    - Sube tu CSV de partidos
-    - Sube tu Excel de seguimiento  
+    - Sube uno o varios CSV de partidos (los repetidos se quitan por Código Partido)
+    - Sube tu Excel de seguimiento (o varios)
     - Se crean automáticamente las columnas:
       - **Técnico** (vacía para que asignes)
       - **Motivo** (vacía para comentarios)
       - **Visto** (calculada según Visualización C y V):
         - 🟢 "Rellenas" si ambas visualizaciones tienen datos
         - 🔴 "Incompletas" si falta alguna visualización
-    - Descarga la agenda completa
+    - Descarga la agenda completa, o una hoja por provincia
     """)
     
     st.subheader("🔄 Actualizar Agenda")
@@ -420,3 +792,29 @@ with st.sidebar:
     - 🔴 **"Incompletas"** = Cualquiera de las dos está vacía
     """)
     st.success("✅ Solo se actualizan fechas, horarios, campos, etc.")
+    
+    st.subheader("⚡ Caché de archivos")
+    stats_cache = cache.estadisticas()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Aciertos", stats_cache['aciertos'])
+    with col2:
+        st.metric("Fallos", stats_cache['fallos'])
+    st.caption(
+        f"{stats_cache['entradas']} entradas · "
+        f"{stats_cache['bytes'] / 1024 ** 2:.1f} MB de {stats_cache['max_bytes'] / 1024 ** 2:.0f} MB"
+    )
+    
+    st.subheader("🧵 Trabajos en segundo plano")
+    stats_trabajos = gestor.estadisticas()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("En curso", stats_trabajos['en_curso'])
+    with col2:
+        st.metric("En cola", stats_trabajos['en_cola'])
+    st.caption(f"{stats_trabajos['workers']} hilos compartidos por todas las sesiones")
+
+# Mientras haya trabajos en curso, volver a ejecutar el script para refrescar su progreso
+if sondeos:
+    time.sleep(0.5)
+    st.rerun()
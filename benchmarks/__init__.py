@@ -0,0 +1,10 @@
+"""Benchmarks reproducibles del procesador con datos sintéticos.
+
+Los archivos reales de la federación no se pueden compartir, así que
+``generadores`` crea ListaPartidos.csv, libros de seguimiento y parejas de
+agendas martes/miércoles con la misma forma que los reales, y ``ejecutar``
+mide cada etapa por separado y guarda los tiempos en JSON::
+
+    python -m benchmarks.ejecutar --escalas 1000 10000 --salida bench/actual.json
+    python -m benchmarks.ejecutar --escalas 1000 10000 --comparar bench/anterior.json
+"""
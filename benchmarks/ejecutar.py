@@ -0,0 +1,262 @@
+"""Mide cada etapa del procesador sobre datos sintéticos y guarda el resultado en JSON.
+
+Etapas (cada una se mide aparte, con sus entradas ya preparadas):
+
+- ``csv``: ``leer_partidos`` sobre ListaPartidos.csv
+- ``excel``: ``leer_seguimiento`` sobre el libro de seguimiento
+- ``excel_referencia``: el mismo libro con ``leer_seguimiento_read_excel``
+- ``merges``: ``enlazar_seguimiento`` (cruce casa y visitante)
+- ``merges_referencia``: el mismo cruce con los dos ``pd.merge`` de antes
+- ``visto``: ``recalcular_derivadas`` sobre la agenda entera
+- ``fechas``: ``formatear_fechas``
+- ``crear_agenda``: las tres anteriores juntas, como en la pestaña 1
+- ``crear_agenda_referencia``: ``crear_agenda`` con el cruce por ``pd.merge``
+- ``xlsx``: ``exportar_excel`` de la agenda
+- ``actualizar_agenda``: pestaña 2 con la pareja martes/miércoles
+
+De cada etapa se guardan el mínimo y la mediana de ``--repeticiones``
+ejecuciones; de las del cruce, además, el pico de memoria (``mb_pico``) de una
+ejecución aparte con tracemalloc, que solo ve lo que reservan Python y numpy.
+Al final de cada escala se muestra cada etapa frente a su referencia. Con
+``--comparar`` se muestra el cociente frente a un JSON anterior (>1 es más
+lento ahora)::
+
+    python -m benchmarks.ejecutar --escalas 1000 10000 100000 --salida bench/actual.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generadores import generar_agendas, generar_lista_partidos, generar_seguimiento
+from procesador.actualizacion import COLUMNAS_POR_DEFECTO, actualizar_agenda
+from procesador.agenda_nueva import (NUEVO_ORDEN, crear_agenda, enlazar_seguimiento, formatear_fechas,
+                                     leer_partidos)
+from procesador.columnas_derivadas import recalcular_derivadas
+from procesador.exportacion import exportar_excel
+from procesador.seguimiento import leer_seguimiento, leer_seguimiento_read_excel
+
+ESCALAS_POR_DEFECTO = [1_000, 10_000, 100_000, 1_000_000]
+
+ETAPAS = ['csv', 'excel', 'excel_referencia', 'merges', 'merges_referencia', 'visto', 'fechas', 'crear_agenda',
+          'crear_agenda_referencia', 'xlsx', 'actualizar_agenda']
+
+# Etapa -> etapa con la implementación anterior con la que se compara
+REFERENCIAS = {
+    'excel': 'excel_referencia',
+    'merges': 'merges_referencia',
+    'crear_agenda': 'crear_agenda_referencia',
+}
+
+
+def cruce_referencia(df_partidos, df_seguimiento):
+    """Cruce con el seguimiento como se hacía antes: dos ``pd.merge`` por la izquierda encadenados."""
+    resultado_casa = pd.merge(df_partidos, df_seguimiento, on=['Competicion', 'Nombre Club Casa'], how='left')
+    df_visitante = df_seguimiento.set_axis(
+        ['Competicion', 'Nombre Club Visitante', 'Visualización V', 'Detalles Equipo Visitante'], axis=1
+    )
+    return pd.merge(resultado_casa, df_visitante, on=['Competicion', 'Nombre Club Visitante'], how='left')
+
+
+def crear_agenda_referencia(df_partidos, df_seguimiento):
+    """``crear_agenda`` con ``cruce_referencia``; "Visto" y las fechas se calculan igual que ahora."""
+    resultado = cruce_referencia(df_partidos, df_seguimiento)
+    resultado['Técnico'] = ''
+    resultado['Motivo'] = ''
+    resultado['Visto'] = ''
+    df_resultado = resultado[NUEVO_ORDEN].copy()
+    recalcular_derivadas(df_resultado)
+    return formatear_fechas(df_resultado)
+
+
+def pico_memoria(funcion, argumentos=()):
+    """Pico de memoria (MB) reservada durante ``funcion(*argumentos)``, según tracemalloc."""
+    tracemalloc.start()
+    try:
+        funcion(*argumentos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1024 ** 2, 2)
+
+
+def medir(funcion, repeticiones, preparar=None, memoria=False):
+    """Tiempos (s) de ``funcion(*preparar())``; la preparación no se mide.
+
+    Con ``memoria`` se añade ``mb_pico``, medido en una ejecución más para que
+    tracemalloc no afecte a los tiempos.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        argumentos = preparar() if preparar is not None else ()
+        inicio = time.perf_counter()
+        funcion(*argumentos)
+        tiempos.append(time.perf_counter() - inicio)
+    medida = {
+        'min': round(min(tiempos), 6),
+        'mediana': round(statistics.median(tiempos), 6),
+        'repeticiones': repeticiones,
+    }
+    if memoria:
+        medida['mb_pico'] = pico_memoria(funcion, preparar() if preparar is not None else ())
+    return medida
+
+
+def medir_escala(num_partidos, etapas=ETAPAS, repeticiones=3, tasa_cambio=0.05, semilla=0):
+    """Genera los datos de una escala y mide las ``etapas`` pedidas."""
+    csv = generar_lista_partidos(num_partidos, semilla)
+    seguimiento = generar_seguimiento(num_partidos, semilla)
+    df_partidos = leer_partidos(BytesIO(csv))
+    df_seguimiento = leer_seguimiento(BytesIO(seguimiento))
+    agenda = crear_agenda(df_partidos, df_seguimiento)
+
+    resultado = {
+        'partidos': num_partidos,
+        'filas_agenda': len(agenda),
+        'mb_csv': round(len(csv) / 1024 ** 2, 2),
+        'mb_seguimiento': round(len(seguimiento) / 1024 ** 2, 2),
+        # Memoria de las tablas ya cargadas (con sus tipos)
+        'mb_memoria_partidos': round(df_partidos.memory_usage(deep=True).sum() / 1024 ** 2, 2),
+        'mb_memoria_agenda': round(agenda.memory_usage(deep=True).sum() / 1024 ** 2, 2),
+        'etapas': {},
+    }
+    medidas = resultado['etapas']
+
+    if 'csv' in etapas:
+        medidas['csv'] = medir(lambda: leer_partidos(BytesIO(csv)), repeticiones)
+    if 'excel' in etapas:
+        medidas['excel'] = medir(lambda: leer_seguimiento(BytesIO(seguimiento)), repeticiones)
+    if 'excel_referencia' in etapas:
+        medidas['excel_referencia'] = medir(
+            lambda: leer_seguimiento_read_excel(BytesIO(seguimiento)), repeticiones
+        )
+    if 'merges' in etapas:
+        medidas['merges'] = medir(lambda: enlazar_seguimiento(df_partidos, df_seguimiento), repeticiones,
+                                  memoria=True)
+    if 'merges_referencia' in etapas:
+        medidas['merges_referencia'] = medir(lambda: cruce_referencia(df_partidos, df_seguimiento), repeticiones,
+                                             memoria=True)
+    if 'visto' in etapas:
+        medidas['visto'] = medir(recalcular_derivadas, repeticiones, lambda: (agenda.copy(),))
+    if 'fechas' in etapas:
+        # La fecha tal como llega de ListaPartidos, antes de darle formato
+        sin_formato = agenda.assign(Fecha=df_partidos['Fecha'].reset_index(drop=True))
+        medidas['fechas'] = medir(formatear_fechas, repeticiones, lambda: (sin_formato.copy(),))
+    if 'crear_agenda' in etapas:
+        medidas['crear_agenda'] = medir(lambda: crear_agenda(df_partidos, df_seguimiento), repeticiones,
+                                        memoria=True)
+    if 'crear_agenda_referencia' in etapas:
+        medidas['crear_agenda_referencia'] = medir(
+            lambda: crear_agenda_referencia(df_partidos, df_seguimiento), repeticiones, memoria=True
+        )
+    if 'xlsx' in etapas:
+        medidas['xlsx'] = medir(lambda: exportar_excel(agenda, 'Resultado'), repeticiones)
+    if 'actualizar_agenda' in etapas:
+        df_martes, df_miercoles = generar_agendas(num_partidos, tasa_cambio, semilla, csv, seguimiento)
+        medidas['actualizar_agenda'] = medir(
+            lambda: actualizar_agenda(df_martes, df_miercoles, COLUMNAS_POR_DEFECTO, None), repeticiones
+        )
+    return resultado
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def frente_a_referencia(escala):
+    """Líneas con el cociente etapa / referencia (tiempo y pico de memoria) de una escala."""
+    lineas = []
+    medidas = escala['etapas']
+    for etapa, referencia in REFERENCIAS.items():
+        if etapa not in medidas or referencia not in medidas or not medidas[referencia]['mediana']:
+            continue
+        linea = f"{escala['partidos']:>9} {etapa:<24} x{medidas[etapa]['mediana'] / medidas[referencia]['mediana']:5.2f} tiempo"
+        if medidas[referencia].get('mb_pico'):
+            linea += f", x{medidas[etapa]['mb_pico'] / medidas[referencia]['mb_pico']:5.2f} memoria"
+        lineas.append(linea)
+    return lineas
+
+
+def comparar(actual, anterior):
+    """Líneas con el cociente mediana actual / mediana anterior por escala y etapa."""
+    lineas = []
+    escalas_anteriores = {escala['partidos']: escala for escala in anterior['escalas']}
+    for escala in actual['escalas']:
+        previa = escalas_anteriores.get(escala['partidos'])
+        if previa is None:
+            continue
+        for etapa, medida in escala['etapas'].items():
+            if etapa not in previa['etapas'] or not previa['etapas'][etapa]['mediana']:
+                continue
+            cociente = medida['mediana'] / previa['etapas'][etapa]['mediana']
+            lineas.append(f"{escala['partidos']:>9} {etapa:<24} x{cociente:5.2f}")
+    return lineas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapas del procesador con datos sintéticos.")
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS_POR_DEFECTO,
+                        help="Número de partidos de cada escala")
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=ETAPAS)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--tasa-cambio', type=float, default=0.05,
+                        help="Fracción de partidos cambiados entre martes y miércoles")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args(argv)
+
+    resultado = {
+        'commit': _commit(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'repeticiones': args.repeticiones,
+        'semilla': args.semilla,
+        'escalas': [],
+    }
+    for num_partidos in args.escalas:
+        escala = medir_escala(num_partidos, args.etapas, args.repeticiones, args.tasa_cambio, args.semilla)
+        resultado['escalas'].append(escala)
+        for etapa, medida in escala['etapas'].items():
+            pico = f", pico {medida['mb_pico']:.1f} MB" if 'mb_pico' in medida else ''
+            print(f"{num_partidos:>9} {etapa:<24} {medida['mediana']:9.4f} s (mín {medida['min']:.4f} s{pico})")
+        lineas = frente_a_referencia(escala)
+        if lineas:
+            print("Frente a la implementación anterior (<1 es mejor ahora):")
+            for linea in lineas:
+                print(linea)
+
+    if args.salida:
+        ruta = Path(args.salida)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding='utf-8')
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+        print(f"\nFrente a {anterior.get('commit') or args.comparar} (>1 es más lento ahora):")
+        for linea in comparar(resultado, anterior):
+            print(linea)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Generadores de archivos sintéticos con la forma de los reales.
+
+- ListaPartidos.csv: latin1, separador ';', un ';' de más al final de cada
+  fila de datos, ``Competición`` con la provincia entre paréntesis y ``Grupo``
+  aparte.
+- Seguimiento_ligas: cabecera, 5 filas basura debajo y 40 columnas, con
+  Competicion en la col 1, Nombre Club en la 3, Detalles Equipo en la 36 y
+  Visualización en la 37.
+- Agendas martes/miércoles: la agenda generada y una copia con una fracción
+  controlada de partidos cambiados (hora, campo o fecha).
+
+Todo depende de una semilla, así que la misma escala da siempre los mismos
+archivos. Uso sin interfaz::
+
+    python -m benchmarks.generadores 10000 --salida fixtures
+"""
+
+import argparse
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from procesador.agenda_nueva import crear_agenda, leer_partidos
+from procesador.esquema import ESQUEMA_AGENDA, tipar
+from procesador.exportacion import exportar_excel
+from procesador.seguimiento import leer_seguimiento
+
+CABECERA_CSV = ['Fecha', 'Hora', 'Jornada', 'Competición', 'Grupo', 'Club Casa', 'Nombre Club Casa',
+                'Equipo Casa', 'Club Visitante', 'Nombre Club Visitante', 'Equipo Visitante', 'Resultado',
+                'Campo', 'Dirección Campo', 'Código Partido', 'Árbitro']
+
+PROVINCIAS = ['Sevilla', 'Málaga', 'Córdoba', 'Cádiz', 'Huelva', 'Jaén', 'Granada', 'Almería']
+CATEGORIAS = ['Primera Andaluza Senior', 'Segunda Andaluza Senior', 'División de Honor Juvenil',
+              'Liga Nacional Juvenil', 'Primera Andaluza Cadete', 'Primera Andaluza Infantil',
+              'Segunda Andaluza Alevín', 'Primera Andaluza Benjamín']
+PREFIJOS = ['C.D.', 'U.D.', 'A.D.', 'C.F.', 'Atlético', 'Real', 'Peña', 'Escuela']
+LOCALIDADES = ['Alcalá', 'Peñaflor', 'Écija', 'Morón', 'Utrera', 'Lebrija', 'Osuna', 'Carmona',
+               'Marchena', 'Estepa', 'Lucena', 'Baena', 'Andújar', 'Úbeda', 'Baeza', 'Nerja',
+               'Coín', 'Álora', 'Motril', 'Guadix', 'Níjar', 'Vícar', 'Ayamonte', 'Lepe']
+
+CLUBES_POR_GRUPO = 16
+PARTIDOS_POR_JORNADA = CLUBES_POR_GRUPO // 2
+
+# Fracción de clubes con fila en el seguimiento y de filas con visualización
+COBERTURA_SEGUIMIENTO = 0.9
+VISUALIZACION_RELLENA = 0.7
+
+COLUMNAS_SEGUIMIENTO_LIBRO = 40
+FILAS_BASURA = 5
+
+
+def _grupos(num_partidos):
+    # Grupos de 16 clubes: (competición, grupo, clubes) suficientes para num_partidos
+    num_grupos = max(1, -(-num_partidos // (PARTIDOS_POR_JORNADA * 2 * (CLUBES_POR_GRUPO - 1))))
+    grupos = []
+    for numero in range(num_grupos):
+        provincia = PROVINCIAS[numero % len(PROVINCIAS)]
+        categoria = CATEGORIAS[(numero // len(PROVINCIAS)) % len(CATEGORIAS)]
+        vuelta = numero // (len(PROVINCIAS) * len(CATEGORIAS))
+        competicion = f"{categoria} ({provincia})"
+        grupo = f"Grupo {vuelta + 1}"
+        clubes = [
+            f"{PREFIJOS[(numero + i) % len(PREFIJOS)]} {LOCALIDADES[(numero * 7 + i) % len(LOCALIDADES)]} {numero}-{i}"
+            for i in range(CLUBES_POR_GRUPO)
+        ]
+        grupos.append((competicion, grupo, clubes))
+    return grupos
+
+
+def _calendario():
+    # Liga a doble vuelta por el método del círculo: (jornada, partido) -> (casa, visitante).
+    # Cada pareja de clubes juega una vez en cada campo y nadie juega dos veces en una jornada.
+    otros = list(range(1, CLUBES_POR_GRUPO))
+    ida = []
+    for ronda in range(CLUBES_POR_GRUPO - 1):
+        circulo = [0] + otros[ronda:] + otros[:ronda]
+        parejas = [(circulo[i], circulo[-1 - i]) for i in range(PARTIDOS_POR_JORNADA)]
+        # El club fijo alterna campo cada jornada
+        if ronda % 2:
+            parejas[0] = parejas[0][::-1]
+        ida.append(parejas)
+    vuelta = [[(visitante, casa) for casa, visitante in parejas] for parejas in ida]
+    return np.array(ida + vuelta)
+
+
+def generar_partidos(num_partidos, semilla=0):
+    """DataFrame de ``num_partidos`` partidos con las columnas de ListaPartidos.csv."""
+    rng = np.random.default_rng(semilla)
+    grupos = _grupos(num_partidos)
+
+    grupo = np.arange(num_partidos) // (PARTIDOS_POR_JORNADA * 2 * (CLUBES_POR_GRUPO - 1))
+    en_grupo = np.arange(num_partidos) % (PARTIDOS_POR_JORNADA * 2 * (CLUBES_POR_GRUPO - 1))
+    jornada = en_grupo // PARTIDOS_POR_JORNADA + 1
+
+    # Calendario de liga en cada grupo: ningún partido se repite en una jornada
+    emparejamientos = _calendario()[jornada - 1, en_grupo % PARTIDOS_POR_JORNADA]
+    casa, visitante = emparejamientos[:, 0], emparejamientos[:, 1]
+    nombre_casa = [grupos[g][2][c] for g, c in zip(grupo, casa)]
+    nombre_visitante = [grupos[g][2][v] for g, v in zip(grupo, visitante)]
+
+    inicio_temporada = pd.Timestamp('2025-09-06')
+    fechas = inicio_temporada + pd.to_timedelta((jornada - 1) * 7 + rng.integers(0, 2, num_partidos), unit='D')
+    horas = rng.integers(9, 21, num_partidos)
+    minutos = rng.choice([0, 15, 30, 45], num_partidos)
+
+    return pd.DataFrame({
+        'Fecha': fechas.strftime('%d/%m/%Y'),
+        'Hora': [f"{h:02d}:{m:02d}" for h, m in zip(horas, minutos)],
+        'Jornada': jornada,
+        'Competición': [grupos[g][0] for g in grupo],
+        'Grupo': [grupos[g][1] for g in grupo],
+        'Club Casa': casa + grupo * CLUBES_POR_GRUPO + 10000,
+        'Nombre Club Casa': nombre_casa,
+        'Equipo Casa': [f"{nombre} \"A\"" for nombre in nombre_casa],
+        'Club Visitante': visitante + grupo * CLUBES_POR_GRUPO + 10000,
+        'Nombre Club Visitante': nombre_visitante,
+        'Equipo Visitante': [f"{nombre} \"A\"" for nombre in nombre_visitante],
+        'Resultado': '',
+        'Campo': [f"Estadio Municipal de {LOCALIDADES[c % len(LOCALIDADES)]}" for c in casa + grupo],
+        'Dirección Campo': [f"Avda. de Andalucía, {c + 1}" for c in casa],
+        'Código Partido': np.arange(num_partidos) + 2_000_000,
+        'Árbitro': '',
+    }, columns=CABECERA_CSV)
+
+
+def generar_lista_partidos(num_partidos, semilla=0):
+    """Bytes de un ListaPartidos.csv con ``num_partidos`` partidos."""
+    df = generar_partidos(num_partidos, semilla)
+    output = BytesIO()
+    output.write((';'.join(CABECERA_CSV) + '\n').encode('latin1'))
+    # Columna vacía de más: cada fila de datos acaba en ';' como en la exportación real
+    df.assign(_fin='').to_csv(output, sep=';', header=False, index=False, encoding='latin1')
+    return output.getvalue()
+
+
+def generar_seguimiento(num_partidos, semilla=0):
+    """Bytes de un Seguimiento_ligas.xlsx que cubre los clubes de ``num_partidos`` partidos."""
+    rng = np.random.default_rng(semilla + 1)
+    output = BytesIO()
+    libro = xlsxwriter.Workbook(output, {'constant_memory': True})
+    hoja = libro.add_worksheet('Seguimiento')
+
+    cabecera = [f"Columna {i + 1}" for i in range(COLUMNAS_SEGUIMIENTO_LIBRO)]
+    cabecera[0], cabecera[2], cabecera[35], cabecera[36] = 'Competición', 'Club', 'Detalles', 'Visualización'
+    hoja.write_row(0, 0, cabecera)
+    for fila in range(1, FILAS_BASURA + 1):
+        hoja.write(fila, 0, f"Notas de seguimiento {fila}")
+
+    fila = FILAS_BASURA + 1
+    for competicion, grupo, clubes in _grupos(num_partidos):
+        for club in clubes:
+            if rng.random() >= COBERTURA_SEGUIMIENTO:
+                continue
+            hoja.write(fila, 0, f"{competicion}, {grupo}")
+            hoja.write(fila, 1, int(rng.integers(1, 5)))
+            hoja.write(fila, 2, club)
+            for columna in range(3, 35, 4):
+                hoja.write(fila, columna, f"Dato {columna}")
+            hoja.write(fila, 35, f"{club} \"A\"")
+            if rng.random() < VISUALIZACION_RELLENA:
+                hoja.write(fila, 36, rng.choice(['Vídeo', 'Presencial', 'Streaming']))
+            hoja.write(fila, COLUMNAS_SEGUIMIENTO_LIBRO - 1, 'ok')
+            fila += 1
+    libro.close()
+    return output.getvalue()
+
+
+def generar_agendas(num_partidos, tasa_cambio=0.05, semilla=0, csv=None, seguimiento=None):
+    """Pareja ``(df_martes, df_miercoles)`` de agendas para la pestaña 2.
+
+    El martes lleva técnicos y motivos asignados; el miércoles es la agenda
+    recién generada con una fracción ``tasa_cambio`` de partidos cambiados en
+    ``Hora``, ``Campo`` o ``Fecha``. Se emparejan por posición de fila. Ambas
+    llevan los tipos con los que ``leer_agenda`` lee una agenda.
+    """
+    rng = np.random.default_rng(semilla + 2)
+    csv = csv if csv is not None else generar_lista_partidos(num_partidos, semilla)
+    seguimiento = seguimiento if seguimiento is not None else generar_seguimiento(num_partidos, semilla)
+    # Sin tipos, como llegaría de Excel, para poder cambiar celdas libremente
+    df_miercoles = crear_agenda(leer_partidos(BytesIO(csv)), leer_seguimiento(BytesIO(seguimiento))).astype(object)
+
+    df_martes = df_miercoles.copy()
+    asignados = rng.random(len(df_martes)) < 0.3
+    df_martes.loc[asignados, 'Técnico'] = rng.choice(['Ana', 'Luis', 'Marta', 'Javi'], int(asignados.sum()))
+    df_martes.loc[asignados, 'Motivo'] = 'Seguimiento jugador'
+
+    cambiados = np.flatnonzero(rng.random(len(df_miercoles)) < tasa_cambio)
+    columna = rng.integers(0, 3, len(cambiados))
+    df_miercoles.loc[cambiados[columna == 0], 'Hora'] = '12:00'
+    df_miercoles.loc[cambiados[columna == 1], 'Campo'] = 'Campo Anexo'
+    df_miercoles.loc[cambiados[columna == 2], 'Fecha'] = '01/06/2026'
+    return tipar(df_martes, ESQUEMA_AGENDA)[0], tipar(df_miercoles, ESQUEMA_AGENDA)[0]
+
+
+def escribir_fixtures(num_partidos, directorio, tasa_cambio=0.05, semilla=0):
+    """Escribe en ``directorio`` los cuatro archivos de una escala y devuelve sus rutas."""
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    csv = generar_lista_partidos(num_partidos, semilla)
+    seguimiento = generar_seguimiento(num_partidos, semilla)
+    df_martes, df_miercoles = generar_agendas(num_partidos, tasa_cambio, semilla, csv, seguimiento)
+
+    rutas = {
+        'csv': directorio / 'ListaPartidos.csv',
+        'seguimiento': directorio / 'Seguimiento_ligas.xlsx',
+        'base': directorio / 'agenda_martes.xlsx',
+        'nueva': directorio / 'agenda_miercoles.xlsx',
+    }
+    rutas['csv'].write_bytes(csv)
+    rutas['seguimiento'].write_bytes(seguimiento)
+    rutas['base'].write_bytes(exportar_excel(df_martes, 'Resultado'))
+    rutas['nueva'].write_bytes(exportar_excel(df_miercoles, 'Resultado'))
+    return rutas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera archivos sintéticos para pruebas y benchmarks.")
+    parser.add_argument('partidos', type=int, help="Número de partidos (p. ej. 1000, 10000, 100000)")
+    parser.add_argument('--salida', default='fixtures', help="Carpeta de salida (por defecto ./fixtures)")
+    parser.add_argument('--tasa-cambio', type=float, default=0.05,
+                        help="Fracción de partidos cambiados en la agenda del miércoles")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for tipo, ruta in escribir_fixtures(args.partidos, args.salida, args.tasa_cambio, args.semilla).items():
+        print(f"{tipo}: {ruta} ({ruta.stat().st_size / 1024 ** 2:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+"""Lógica de procesamiento de partidos, independiente de la interfaz Streamlit."""
+
+from procesador.actualizacion import actualizar_agenda, leer_agenda
+from procesador.agenda_nueva import crear_agenda, leer_partidos
+from procesador.indice_seguimiento import cargar_indice
+from procesador.pipeline import actualizar_agenda_desde_archivos, crear_agenda_desde_archivos
+from procesador.seguimiento import leer_seguimiento
+
+__all__ = [
+    'actualizar_agenda', 'actualizar_agenda_desde_archivos', 'cargar_indice', 'crear_agenda',
+    'crear_agenda_desde_archivos', 'leer_agenda', 'leer_partidos', 'leer_seguimiento',
+]
@@ -0,0 +1,5 @@
+import sys
+
+from procesador.lotes import main
+
+sys.exit(main())
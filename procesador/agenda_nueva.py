@@ -0,0 +1,281 @@
+"""Creación de una agenda nueva a partir de ListaPartidos.csv y Seguimiento_ligas.xlsm.
+
+El cruce con el seguimiento se hacía con dos ``pd.merge`` sobre claves de
+texto (casa y visitante), copiando la tabla entera en cada uno. Ahora las
+claves se codifican una vez y la agenda se monta columna a columna en su orden
+final. Con 200.000 partidos: ~3,8 s y 165 MB de pico antes, ~1,8 s y 26 MB
+ahora (la mayor parte es dar formato a las fechas).
+
+Las columnas se leen con los tipos de ``esquema.ESQUEMA_PARTIDOS``:
+competiciones, clubes y campos como categorías, de modo que la provincia, la
+competición con su grupo y el texto de cada fecha se calculan una vez por valor
+distinto y no por fila.
+"""
+
+import numpy as np
+import pandas as pd
+
+from procesador.columnas_derivadas import recalcular_derivadas
+from procesador.esquema import (ESQUEMA_PARTIDOS, OBLIGATORIAS_PARTIDOS, leer_fechas, por_categoria, texto_fechas,
+                                tipar, tipos_lectura)
+from procesador.rendimiento import etapa
+
+# Orden final de las columnas de la agenda (las columnas de trabajo primero)
+NUEVO_ORDEN = ['Técnico', 'Motivo', 'Visto', 'Fecha', 'Hora', 'Jornada', 'Competicion', 'Provincia', 'Nombre Club Casa',
+               'Visualización C', 'Detalles Equipo Casa', 'Nombre Club Visitante',
+               'Visualización V', 'Detalles Equipo Visitante', 'Campo', 'Dirección Campo']
+
+# Columnas de la agenda que vienen de ListaPartidos
+COLUMNAS_PARTIDO = ['Fecha', 'Hora', 'Jornada', 'Competicion', 'Provincia', 'Nombre Club Casa',
+                    'Nombre Club Visitante', 'Campo', 'Dirección Campo']
+
+# Columnas de ListaPartidos.csv necesarias para montar COLUMNAS_PARTIDO
+COLUMNAS_CSV = ['Fecha', 'Hora', 'Jornada', 'Competición', 'Grupo', 'Nombre Club Casa',
+                'Nombre Club Visitante', 'Campo', 'Dirección Campo']
+
+# Filas por bloque en la lectura por bloques: ~50.000 partidos ocupan unos 40 MB
+FILAS_POR_BLOQUE = 50_000
+
+
+def leer_partidos(fuente, conservar_codigo=False):
+    """Lee ListaPartidos.csv y deja las columnas que usa la agenda.
+
+    Las columnas salen con los tipos de ``ESQUEMA_PARTIDOS`` (``Fecha`` como
+    datetime). Los avisos de validación (columnas que faltan, fechas u horas
+    que no se entienden) quedan en ``df.attrs['avisos']``. Con
+    ``conservar_codigo`` se mantiene ``Código Partido`` (para quitar partidos
+    repetidos al juntar varios CSV).
+    """
+    # - Competición/Grupo se leen como categorías de texto: evita que pandas los
+    #   infiera como int/float y rompa la concatenación de más abajo.
+    # - index_col=False: el CSV trae un ';' de más al final de cada fila (18 campos
+    #   contra 17 cabeceras). Sin esto, pandas usa la 1ª columna como índice y
+    #   desplaza todos los datos una columna a la izquierda.
+    with etapa('leer_csv') as registro:
+        lect_partidos = pd.read_csv(
+            fuente, encoding="latin1", on_bad_lines='skip', sep=';',
+            dtype=tipos_lectura(ESQUEMA_PARTIDOS),
+            index_col=False,
+        )
+        # Si el separador de más generó una columna sin nombre al final, descártala.
+        lect_partidos = lect_partidos.loc[:, ~lect_partidos.columns.astype(str).str.startswith('Unnamed')]
+        lect_partidos, avisos = _tipar_partidos(lect_partidos)
+
+        # Crear DataFrame de partidos
+        descartadas = ['Club Casa', 'Club Visitante', 'Equipo Casa', 'Equipo Visitante', 'Resultado', 'Árbitro']
+        if not conservar_codigo:
+            descartadas.append('Código Partido')
+        df_partidos = lect_partidos.drop(columns=descartadas, errors='ignore')
+        df_partidos = _columnas_competicion(df_partidos)
+        df_partidos.attrs['avisos'] = avisos
+        registro.filas_salida = len(df_partidos)
+    return df_partidos
+
+
+def _tipar_partidos(df):
+    # Tipos y validación en una pasada; sin las columnas obligatorias no hay agenda que montar
+    df, avisos = tipar(df, ESQUEMA_PARTIDOS, OBLIGATORIAS_PARTIDOS)
+    if avisos['columnas_faltan']:
+        raise KeyError(f"ListaPartidos.csv no tiene las columnas {avisos['columnas_faltan']}")
+    return df, avisos
+
+
+def _unir_categorias(primera, segunda, separador):
+    # "primera + separador + segunda" una vez por pareja distinta; vacío si falta cualquiera
+    codigos_primera = primera.cat.codes.to_numpy().astype(np.int64)
+    codigos_segunda = segunda.cat.codes.to_numpy().astype(np.int64)
+    num_segunda = len(segunda.cat.categories)
+    vacio = (codigos_primera < 0) | (codigos_segunda < 0)
+    codigos_pareja, parejas = pd.factorize(np.where(vacio, -1, codigos_primera * num_segunda + codigos_segunda))
+
+    textos = np.full(len(parejas), np.nan, dtype=object)
+    validas = parejas >= 0
+    textos[validas] = (
+        primera.cat.categories.take(parejas[validas] // num_segunda) + separador
+        + segunda.cat.categories.take(parejas[validas] % num_segunda)
+    ).to_numpy(dtype=object)
+
+    # Dos parejas distintas pueden dar el mismo texto: cada texto es una sola categoría
+    codigos_texto, categorias = pd.factorize(textos)
+    return pd.Series(
+        pd.Categorical.from_codes(codigos_texto.take(codigos_pareja), categories=categorias),
+        index=primera.index,
+    )
+
+
+def _columnas_competicion(df_partidos):
+    # Extraer la provincia de la columna 'Competición' (una vez por competición distinta)
+    df_partidos['Provincia'] = por_categoria(
+        df_partidos['Competición'], lambda competiciones: competiciones.str.extract(r'\((.*?)\)', expand=False)
+    )
+
+    # Concatenar 'Competición' y 'Grupo' en una nueva columna
+    df_partidos['Competicion'] = _unir_categorias(df_partidos['Competición'], df_partidos['Grupo'], ", ")
+
+    # Eliminar las columnas originales 'Competición' y 'Grupo'
+    return df_partidos.drop(columns=['Competición', 'Grupo'], errors='ignore')
+
+
+def leer_partidos_por_bloques(fuente, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Lee ListaPartidos.csv por bloques de ``filas_por_bloque`` filas.
+
+    Cada bloque es igual que el trozo correspondiente de ``leer_partidos``, pero
+    solo se leen las columnas que usa la agenda: las que se descartan (y la
+    columna sin nombre del ';' final) no llegan a cargarse. Las categorías de
+    cada bloque son solo las de sus filas.
+    """
+    lector = pd.read_csv(
+        fuente, encoding="latin1", on_bad_lines='skip', sep=';',
+        dtype=tipos_lectura({col: tipo for col, tipo in ESQUEMA_PARTIDOS.items() if col in COLUMNAS_CSV}),
+        index_col=False, usecols=lambda col: col in COLUMNAS_CSV,
+        chunksize=filas_por_bloque,
+    )
+    with lector:
+        for bloque in lector:
+            bloque, avisos = _tipar_partidos(bloque)
+            bloque = _columnas_competicion(bloque)
+            bloque.attrs['avisos'] = avisos
+            yield bloque
+
+
+def _filas_seguimiento(orden, inicio, cuenta, desplazamiento):
+    # Fila del seguimiento para cada coincidencia; -1 si el club no está en el seguimiento
+    if not len(orden):
+        return np.full(len(inicio), -1, dtype=np.intp)
+    posicion = np.minimum(inicio + desplazamiento, len(orden) - 1)
+    return np.where(cuenta > 0, orden[posicion], -1)
+
+
+def _tomar(serie, filas):
+    # Como el merge: las filas -1 quedan vacías (NaN), promoviendo el tipo si hace falta
+    return pd.Series(serie.array.take(filas, allow_fill=True), name=serie.name)
+
+
+def enlazar_seguimiento(df_partidos, df_seguimiento):
+    """Filas de seguimiento que corresponden a cada partido, como casa y como visitante.
+
+    Competiciones y clubes se codifican una sola vez en códigos compartidos por
+    partidos y seguimiento, y ambas búsquedas se resuelven juntas. Devuelve
+    ``(fila_partido, fila_casa, fila_visitante)``: una entrada por fila de la
+    agenda, en el mismo orden que darían los dos ``pd.merge(how='left')``
+    encadenados (incluida la multiplicación de filas si el seguimiento tiene
+    claves repetidas). ``fila_partido`` es ``None`` si no hay repetidas.
+    """
+    n_partidos = len(df_partidos)
+
+    # NaN también es una clave (el merge empareja vacíos con vacíos)
+    codigos_comp, _ = pd.factorize(
+        pd.concat([df_partidos['Competicion'], df_seguimiento['Competicion']], ignore_index=True),
+        use_na_sentinel=False,
+    )
+    codigos_club, clubes = pd.factorize(
+        pd.concat([df_partidos['Nombre Club Casa'], df_partidos['Nombre Club Visitante'],
+                   df_seguimiento['Nombre Club Casa']], ignore_index=True),
+        use_na_sentinel=False,
+    )
+    codigos_comp = codigos_comp.astype(np.int64) * max(len(clubes), 1)
+    clave_casa = codigos_comp[:n_partidos] + codigos_club[:n_partidos]
+    clave_visitante = codigos_comp[:n_partidos] + codigos_club[n_partidos:2 * n_partidos]
+    clave_seguimiento = codigos_comp[n_partidos:] + codigos_club[2 * n_partidos:]
+
+    # Ordenación estable: las repetidas conservan el orden del seguimiento, como en el merge
+    orden = np.argsort(clave_seguimiento, kind='stable')
+    ordenadas = clave_seguimiento[orden]
+    inicio_casa = np.searchsorted(ordenadas, clave_casa, side='left')
+    cuenta_casa = np.searchsorted(ordenadas, clave_casa, side='right') - inicio_casa
+    inicio_visitante = np.searchsorted(ordenadas, clave_visitante, side='left')
+    cuenta_visitante = np.searchsorted(ordenadas, clave_visitante, side='right') - inicio_visitante
+
+    repeticiones_casa = np.maximum(cuenta_casa, 1)
+    repeticiones_visitante = np.maximum(cuenta_visitante, 1)
+    tamanos = repeticiones_casa * repeticiones_visitante
+
+    if not n_partidos or tamanos.max() == 1:
+        cero = np.zeros(n_partidos, dtype=np.intp)
+        return (
+            None,
+            _filas_seguimiento(orden, inicio_casa, cuenta_casa, cero),
+            _filas_seguimiento(orden, inicio_visitante, cuenta_visitante, cero),
+        )
+
+    # Cada partido se repite (coincidencias casa) x (coincidencias visitante) veces
+    fila_partido = np.repeat(np.arange(n_partidos), tamanos)
+    desplazamiento = np.arange(len(fila_partido)) - np.repeat(np.cumsum(tamanos) - tamanos, tamanos)
+    por_casa = repeticiones_visitante[fila_partido]
+    return (
+        fila_partido,
+        _filas_seguimiento(orden, inicio_casa[fila_partido], cuenta_casa[fila_partido],
+                           desplazamiento // por_casa),
+        _filas_seguimiento(orden, inicio_visitante[fila_partido], cuenta_visitante[fila_partido],
+                           desplazamiento % por_casa),
+    )
+
+
+def crear_agenda(df_partidos, df_seguimiento):
+    """Cruza los partidos con el seguimiento (casa y visitante) y da formato a la agenda."""
+    faltan = [col for col in COLUMNAS_PARTIDO if col not in df_partidos.columns]
+    if faltan:
+        raise KeyError(f"{faltan} not in index")
+
+    # El cruce equivale a dos merges por la izquierda: si salen más filas, hay claves repetidas
+    with etapa('cruce_seguimiento', filas_entrada=len(df_partidos), cruce=True) as registro:
+        fila_partido, fila_casa, fila_visitante = enlazar_seguimiento(df_partidos, df_seguimiento)
+
+        # Construir la agenda directamente en el orden final, columna a columna
+        columnas = {}
+        for col in COLUMNAS_PARTIDO:
+            serie = df_partidos[col]
+            if fila_partido is not None:
+                serie = serie.take(fila_partido)
+            columnas[col] = serie.reset_index(drop=True)
+        columnas['Visualización C'] = _tomar(df_seguimiento['Visualización C'], fila_casa)
+        columnas['Detalles Equipo Casa'] = _tomar(df_seguimiento['Detalles Equipo Casa'], fila_casa)
+        columnas['Visualización V'] = _tomar(df_seguimiento['Visualización C'], fila_visitante)
+        columnas['Detalles Equipo Visitante'] = _tomar(df_seguimiento['Detalles Equipo Casa'], fila_visitante)
+        registro.filas_salida = len(columnas['Fecha'])
+
+    # Agregar las columnas de técnico y motivo al inicio (vacías)
+    columnas['Técnico'] = ''  # Columna A - vacía para que puedas llenarla
+    columnas['Motivo'] = ''   # Columna B - vacía para que puedas llenarla
+
+    columnas['Visto'] = ''
+
+    df_resultado = pd.DataFrame(
+        {col: columnas[col] for col in NUEVO_ORDEN}, index=pd.RangeIndex(len(columnas['Fecha']))
+    )
+
+    # Calcular la columna "Visto" (Columna C)
+    with etapa('visto', filas_entrada=len(df_resultado)):
+        recalcular_derivadas(df_resultado)
+    return formatear_fechas(df_resultado)
+
+
+def formatear_fechas(df_resultado):
+    """Deja ``Fecha`` (en sitio) como texto dd/mm/yyyy; las que no se entienden quedan vacías."""
+    with etapa('fechas', filas_entrada=len(df_resultado)):
+        # Convertir la columna 'Fecha' a formato datetime (ya lo es si viene de leer_partidos)
+        fechas = leer_fechas(df_resultado['Fecha'])
+
+        # Aplicar el formato de fecha deseado, una vez por fecha distinta
+        df_resultado['Fecha'] = texto_fechas(fechas)
+    return df_resultado
+
+
+def crear_agenda_por_bloques(fuente_csv, df_seguimiento, filas_por_bloque=FILAS_POR_BLOQUE, progreso=None):
+    """Agenda de ``fuente_csv`` en bloques, sin cargar el CSV entero.
+
+    Cada bloque de partidos se cruza con el seguimiento nada más leerlo y se
+    devuelve su trozo de agenda; así la memoria depende del tamaño del bloque y
+    no del archivo. ``progreso(filas)`` recibe las filas de partidos leídas hasta
+    el momento. Siempre devuelve al menos un bloque (vacío si el CSV no tiene filas).
+    """
+    leidas = 0
+    vacio = True
+    for df_partidos in leer_partidos_por_bloques(fuente_csv, filas_por_bloque):
+        leidas += len(df_partidos)
+        vacio = False
+        yield crear_agenda(df_partidos, df_seguimiento)
+        if progreso is not None:
+            progreso(leidas)
+    if vacio:
+        yield pd.DataFrame(columns=NUEVO_ORDEN)
@@ -0,0 +1,366 @@
+"""Almacén local de agendas con versiones y registro de cambios por celda.
+
+Cada actualización diaria subía la agenda entera y la nueva y volvía a
+escribirlo todo, sin más historial que ``Ultima_Actualizacion``. El almacén
+(un SQLite) guarda la agenda actual fila a fila y, por cada versión, solo las
+celdas que cambiaron (valor anterior y nuevo). Actualizar escribe únicamente
+las filas modificadas y su registro, aunque para emparejar los partidos sigue
+leyendo la versión actual entera; cualquier versión anterior se reconstruye
+deshaciendo los cambios posteriores sobre la actual.
+
+Las filas guardan la competición y la jornada en columnas indexadas, así que
+exportar una competición o jornada concreta no lee la agenda entera. Técnico,
+Motivo y Visto se guardan como el resto de columnas; ``actualizar`` nunca los
+toca (ver ``COLUMNAS_PROTEGIDAS``) y ``guardar`` registra los cambios que el
+usuario haya hecho en ellos en Excel.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from procesador.actualizacion import _celdas_distintas, actualizar_agenda
+from procesador.columnas_derivadas import COLUMNAS_DERIVADAS
+from procesador.rendimiento import etapa
+
+RUTA_ALMACEN = Path(
+    os.environ.get('PROCESADOR_ALMACEN', Path.home() / '.cache' / 'procesador-futbol' / 'agendas.sqlite')
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS versiones (
+    agenda TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    descripcion TEXT,
+    filas INTEGER NOT NULL,
+    celdas_cambiadas INTEGER NOT NULL,
+    PRIMARY KEY (agenda, version)
+);
+CREATE TABLE IF NOT EXISTS columnas (
+    agenda TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    desde_version INTEGER NOT NULL,
+    PRIMARY KEY (agenda, posicion)
+);
+CREATE TABLE IF NOT EXISTS partidos (
+    agenda TEXT NOT NULL,
+    fila INTEGER NOT NULL,
+    competicion TEXT,
+    jornada TEXT,
+    datos TEXT NOT NULL,
+    PRIMARY KEY (agenda, fila)
+);
+CREATE INDEX IF NOT EXISTS partidos_bloque ON partidos (agenda, competicion, jornada);
+CREATE TABLE IF NOT EXISTS cambios (
+    agenda TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    fila INTEGER NOT NULL,
+    columna TEXT NOT NULL,
+    anterior TEXT,
+    nuevo TEXT
+);
+CREATE INDEX IF NOT EXISTS cambios_version ON cambios (agenda, version);
+"""
+
+# Columnas de la agenda que se guardan además en columnas indexadas, para exportar trozos
+COLUMNAS_BLOQUE = ['Competicion', 'Jornada']
+_COLUMNA_INDICE = {'Competicion': 'competicion', 'Jornada': 'jornada'}
+
+
+def _a_json(valor):
+    # Valor de una celda -> algo que json admite; las fechas se marcan para recuperarlas
+    if valor is None or valor is pd.NA or valor is pd.NaT or (isinstance(valor, float) and math.isnan(valor)):
+        return None
+    if isinstance(valor, (pd.Timestamp, datetime)):
+        return {'$fecha': pd.Timestamp(valor).isoformat()}
+    if isinstance(valor, np.generic):
+        return _a_json(valor.item())
+    return valor
+
+
+def _de_json(valor):
+    if isinstance(valor, dict) and '$fecha' in valor:
+        return pd.Timestamp(valor['$fecha'])
+    return valor
+
+
+def _texto(valor):
+    return None if valor is None else json.dumps(_a_json(valor), ensure_ascii=False)
+
+
+def _texto_bloque(valor):
+    # Valor de Competicion/Jornada tal como se guarda en las columnas indexadas
+    return None if _a_json(valor) is None else str(valor)
+
+
+def diferencias(df_antes, df_despues, columnas=None):
+    """Celdas distintas entre dos agendas con las mismas filas, como ``(fila, columna, anterior, nuevo)``.
+
+    Las columnas nuevas de ``df_despues`` cuentan como vacías antes. Con
+    ``columnas`` solo se comparan esas (las que no estén en ``df_despues`` se
+    ignoran).
+    """
+    if len(df_antes) != len(df_despues):
+        raise ValueError(
+            f"Las agendas tienen distinto número de filas ({len(df_antes)} y {len(df_despues)}); "
+            "el almacén solo registra cambios de celdas"
+        )
+    cambios = []
+    vacias = np.full(len(df_antes), np.nan, dtype=object)
+    for columna in df_despues.columns if columnas is None else [c for c in columnas if c in df_despues.columns]:
+        anteriores = df_antes[columna].to_numpy(dtype=object) if columna in df_antes.columns else vacias
+        nuevos = df_despues[columna].to_numpy(dtype=object)
+        for fila in np.flatnonzero(_celdas_distintas(anteriores, nuevos)):
+            cambios.append((int(fila), columna, anteriores[fila], nuevos[fila]))
+    return cambios
+
+
+class AlmacenAgendas:
+    """Agendas guardadas por nombre, con sus versiones y cambios.
+
+    Cada operación abre su propia conexión, así que una misma instancia se
+    puede usar desde varios hilos; las escrituras se serializan.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = Path(ruta) if ruta is not None else RUTA_ALMACEN
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def agendas(self):
+        """DataFrame con cada agenda, su última versión y su número de filas."""
+        with closing(self._conectar()) as conexion:
+            return pd.read_sql_query(
+                "SELECT agenda, MAX(version) AS version, MAX(fecha) AS fecha, "
+                "(SELECT COUNT(*) FROM partidos p WHERE p.agenda = v.agenda) AS filas "
+                "FROM versiones v GROUP BY agenda ORDER BY agenda",
+                conexion,
+            )
+
+    def historial(self, nombre):
+        """Versiones de ``nombre`` con su fecha, descripción y celdas cambiadas."""
+        with closing(self._conectar()) as conexion:
+            return pd.read_sql_query(
+                "SELECT version, fecha, descripcion, filas, celdas_cambiadas FROM versiones "
+                "WHERE agenda = ? ORDER BY version",
+                conexion, params=(nombre,),
+            )
+
+    def cambios(self, nombre, version):
+        """Celdas que cambió la ``version`` de ``nombre``."""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                "SELECT fila, columna, anterior, nuevo FROM cambios WHERE agenda = ? AND version = ? "
+                "ORDER BY fila, columna",
+                (nombre, version),
+            ).fetchall()
+        return pd.DataFrame(
+            [(fila, columna, _de_json(json.loads(anterior)) if anterior else None,
+              _de_json(json.loads(nuevo)) if nuevo else None)
+             for fila, columna, anterior, nuevo in filas],
+            columns=['fila', 'columna', 'anterior', 'nuevo'],
+        )
+
+    def _version_actual(self, conexion, nombre):
+        return conexion.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM versiones WHERE agenda = ?", (nombre,)
+        ).fetchone()[0]
+
+    def version_actual(self, nombre):
+        """Última versión de ``nombre`` (0 si no está en el almacén)."""
+        with closing(self._conectar()) as conexion:
+            return self._version_actual(conexion, nombre)
+
+    def cargar(self, nombre, version=None, competicion=None, jornada=None):
+        """Agenda ``nombre`` tal como estaba en ``version`` (por defecto la última).
+
+        ``competicion`` y ``jornada`` filtran las filas (se comparan como texto)
+        por el valor que tenían en ``version``, no por el actual. El índice del
+        DataFrame es la fila de la agenda.
+        """
+        with etapa('cargar_almacen') as registro, closing(self._conectar()) as conexion:
+            actual = self._version_actual(conexion, nombre)
+            if not actual:
+                raise KeyError(f"No hay ninguna agenda '{nombre}' en el almacén")
+            version = actual if version is None else int(version)
+            if not 1 <= version <= actual:
+                raise ValueError(f"La agenda '{nombre}' tiene las versiones 1 a {actual}")
+
+            columnas = [
+                columna for columna, desde in conexion.execute(
+                    "SELECT nombre, desde_version FROM columnas WHERE agenda = ? ORDER BY posicion", (nombre,)
+                )
+                if desde <= version
+            ]
+
+            filtros = {
+                columna: str(valor)
+                for columna, valor in zip(COLUMNAS_BLOQUE, (competicion, jornada)) if valor is not None
+            }
+            consulta = "SELECT fila, datos FROM partidos WHERE agenda = ?"
+            parametros = [nombre]
+            if filtros:
+                # Las columnas indexadas tienen los valores de la versión actual
+                condicion = " AND ".join(f"{_COLUMNA_INDICE[columna]} = ?" for columna in filtros)
+                parametros += list(filtros.values())
+                if version < actual:
+                    # Una fila cuya competición o jornada cambió después de ``version`` pudo
+                    # estar entonces en el trozo pedido: se reconstruye y se filtra después
+                    condicion = (
+                        f"({condicion}) OR fila IN (SELECT fila FROM cambios WHERE agenda = ? AND version > ? "
+                        f"AND columna IN ({', '.join('?' * len(filtros))}))"
+                    )
+                    parametros += [nombre, version, *filtros]
+                consulta += f" AND ({condicion})"
+            filas = conexion.execute(consulta + " ORDER BY fila", parametros).fetchall()
+
+            registros = {}
+            for fila, datos in filas:
+                registros[fila] = {columna: _de_json(valor) for columna, valor in json.loads(datos).items()}
+
+            # Versión anterior: deshacer, de la más reciente hacia atrás, los cambios posteriores
+            if version < actual and registros:
+                for fila, columna, anterior in conexion.execute(
+                    "SELECT fila, columna, anterior FROM cambios WHERE agenda = ? AND version > ? "
+                    "ORDER BY version DESC, rowid DESC",
+                    (nombre, version),
+                ):
+                    if fila in registros:
+                        registros[fila][columna] = _de_json(json.loads(anterior)) if anterior else None
+                registros = {
+                    fila: valores for fila, valores in registros.items()
+                    if all(_texto_bloque(valores.get(columna)) == valor for columna, valor in filtros.items())
+                }
+
+            df = pd.DataFrame.from_dict(registros, orient='index')
+            df = df.reindex(columns=columnas)
+            df.index.name = None
+            registro.filas_salida = len(df)
+        return df
+
+    def _escribir_version(self, conexion, nombre, version, df, cambios, descripcion):
+        # Columnas nuevas al final, con la versión en la que aparecieron
+        conocidas = [columna for (columna,) in conexion.execute(
+            "SELECT nombre FROM columnas WHERE agenda = ? ORDER BY posicion", (nombre,)
+        )]
+        for columna in df.columns:
+            if columna not in conocidas:
+                conexion.execute(
+                    "INSERT INTO columnas (agenda, posicion, nombre, desde_version) VALUES (?, ?, ?, ?)",
+                    (nombre, len(conocidas), str(columna), version),
+                )
+                conocidas.append(columna)
+
+        # Solo se reescriben las filas con algún cambio
+        filas_cambiadas = sorted({fila for fila, _, _, _ in cambios})
+        nombres = [str(columna) for columna in df.columns]
+        bloque = [nombres.index(columna) if columna in nombres else None for columna in COLUMNAS_BLOQUE]
+        conexion.executemany(
+            "INSERT OR REPLACE INTO partidos (agenda, fila, competicion, jornada, datos) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    nombre, fila,
+                    *(None if i is None else _texto_bloque(valores[i]) for i in bloque),
+                    json.dumps(dict(zip(nombres, map(_a_json, valores))), ensure_ascii=False),
+                )
+                for fila, valores in zip(filas_cambiadas, df.iloc[filas_cambiadas].itertuples(index=False, name=None))
+            ),
+        )
+        if version > 1:
+            conexion.executemany(
+                "INSERT INTO cambios (agenda, version, fila, columna, anterior, nuevo) VALUES (?, ?, ?, ?, ?, ?)",
+                ((nombre, version, fila, str(columna), _texto(anterior), _texto(nuevo))
+                 for fila, columna, anterior, nuevo in cambios),
+            )
+        conexion.execute(
+            "INSERT INTO versiones (agenda, version, fecha, descripcion, filas, celdas_cambiadas) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (nombre, version, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), descripcion, len(df),
+             0 if version == 1 else len(cambios)),
+        )
+
+    def guardar(self, nombre, df, descripcion=None):
+        """Guarda ``df`` como nueva versión de ``nombre`` y devuelve su número.
+
+        La primera vez se guarda entera; después solo se registran las celdas
+        que difieren de la versión actual (fila a fila por posición), p. ej.
+        los técnicos asignados en Excel.
+        """
+        df = df.reset_index(drop=True)
+        with self._lock, closing(self._conectar()) as conexion, conexion:
+            if not self._version_actual(conexion, nombre):
+                cambios = [(fila, None, None, None) for fila in range(len(df))]
+                self._escribir_version(conexion, nombre, 1, df, cambios, descripcion or "Agenda inicial")
+                return 1
+        version = self.version_actual(nombre)
+        cambios = diferencias(self.cargar(nombre, version).reset_index(drop=True), df)
+        return self._nueva_version(nombre, version, df, cambios, descripcion or "Cambios guardados")
+
+    def _nueva_version(self, nombre, base, df, cambios, descripcion):
+        # Escribe la versión base + 1 si nadie ha guardado otra entretanto
+        with self._lock, closing(self._conectar()) as conexion, conexion:
+            if self._version_actual(conexion, nombre) != base:
+                raise RuntimeError(f"La agenda '{nombre}' ha cambiado mientras se guardaba; vuelve a intentarlo")
+            self._escribir_version(conexion, nombre, base + 1, df, cambios, descripcion)
+        return base + 1
+
+    def actualizar(self, nombre, df_nuevo, columnas_a_actualizar, columna_id=None, aproximada=False,
+                   descripcion=None):
+        """Aplica ``actualizar_agenda`` sobre la versión actual y guarda solo lo que cambia.
+
+        Devuelve ``(df_actualizado, stats, version)``; ``version`` es None si
+        no cambió ninguna celda. La versión actual se carga entera (hay que
+        emparejar todos sus partidos), así que el coste crece con el tamaño de
+        la agenda aunque no cambie nada; lo que se escribe en el almacén sí es
+        solo lo que cambia.
+        """
+        base = self.version_actual(nombre)
+        df_actual = self.cargar(nombre, base).reset_index(drop=True)
+        df_actualizado, stats = actualizar_agenda(
+            df_actual, df_nuevo, columnas_a_actualizar, columna_id, aproximada
+        )
+        if not stats['partidos_actualizados']:
+            return df_actualizado, stats, None
+
+        # Solo se comparan las columnas que ``actualizar_agenda`` puede modificar
+        cambios = diferencias(
+            df_actual, df_actualizado,
+            [*columnas_a_actualizar, 'Ultima_Actualizacion', *COLUMNAS_DERIVADAS],
+        )
+        if not cambios:
+            return df_actualizado, stats, None
+
+        version = self._nueva_version(
+            nombre, base, df_actualizado, cambios,
+            descripcion or f"Actualización: {stats['partidos_actualizados']} partidos",
+        )
+        return df_actualizado, stats, version
+
+    def bloques(self, nombre):
+        """Pares (competicion, jornada) de la agenda, para filtrar exportaciones."""
+        with closing(self._conectar()) as conexion:
+            return pd.read_sql_query(
+                "SELECT competicion, jornada, COUNT(*) AS filas FROM partidos WHERE agenda = ? "
+                "GROUP BY competicion, jornada ORDER BY competicion, jornada",
+                conexion, params=(nombre,),
+            )
+
+    def borrar(self, nombre):
+        with self._lock, closing(self._conectar()) as conexion, conexion:
+            for tabla in ('versiones', 'columnas', 'partidos', 'cambios'):
+                conexion.execute(f"DELETE FROM {tabla} WHERE agenda = ?", (nombre,))
@@ -0,0 +1,128 @@
+"""Caché por contenido de archivos subidos y resultados intermedios.
+
+Streamlit vuelve a ejecutar todo el script en cada interacción (incluido el
+clic en el botón de descarga). Esta caché guarda los DataFrames leídos, las
+agendas generadas y los bytes del Excel exportado, indexados por el SHA-256
+del contenido subido más los parámetros del proceso, de modo que repetir una
+operación con los mismos archivos no vuelve a abrir los libros con openpyxl.
+
+Las sesiones y los trabajos en segundo plano comparten la caché: si varios
+piden a la vez una clave que no está, solo el primero la calcula y el resto
+espera su resultado.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+MAX_BYTES_POR_DEFECTO = 512 * 1024 * 1024
+
+
+def huella(datos):
+    """SHA-256 (hex) de los bytes de un archivo."""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def _tamano(valor):
+    # Estimación del tamaño en memoria para aplicar el límite de la caché
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=True))
+    if isinstance(valor, (list, tuple)):
+        return sum(_tamano(v) for v in valor)
+    if isinstance(valor, dict):
+        return sum(_tamano(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+class CacheContenido:
+    """Caché LRU con límite de memoria y contadores de aciertos/fallos.
+
+    Los valores devueltos se comparten entre ejecuciones: quien los use no
+    debe modificarlos en sitio.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES_POR_DEFECTO):
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._en_curso = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, calcular):
+        """Devuelve el valor de ``clave``; si no está, lo calcula con ``calcular()``.
+
+        Si otro hilo ya está calculando ``clave``, espera a su resultado en vez
+        de calcularlo otra vez (cuenta como acierto). Si ese cálculo falla, uno
+        de los que esperaban lo intenta de nuevo.
+        """
+        while True:
+            with self._lock:
+                if clave in self._entradas:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return self._entradas[clave][0]
+                futuro = self._en_curso.get(clave)
+                if futuro is None:
+                    futuro = self._en_curso[clave] = Future()
+                    self.fallos += 1
+                    break
+            try:
+                valor = futuro.result()
+            except Exception:
+                # El cálculo del otro hilo falló (o se canceló su trabajo): se vuelve a intentar
+                continue
+            with self._lock:
+                self.aciertos += 1
+            return valor
+
+        try:
+            valor = calcular()
+        except BaseException as e:
+            with self._lock:
+                del self._en_curso[clave]
+            futuro.set_exception(e)
+            raise
+        self.guardar(clave, valor)
+        with self._lock:
+            del self._en_curso[clave]
+        futuro.set_result(valor)
+        return valor
+
+    def guardar(self, clave, valor):
+        tamano = _tamano(valor)
+        with self._lock:
+            if clave in self._entradas:
+                self._bytes -= self._entradas.pop(clave)[1]
+            # Un valor mayor que el límite no se guarda, pero no vacía la caché
+            if tamano > self.max_bytes:
+                return
+            self._entradas[clave] = (valor, tamano)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                _, (_, liberado) = self._entradas.popitem(last=False)
+                self._bytes -= liberado
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,73 @@
+"""Columnas calculadas de la agenda (las que en el Excel son fórmulas).
+
+Cada regla recibe el DataFrame y devuelve la columna entera, evaluada sobre
+columnas completas con máscaras de vacíos en lugar de fila a fila. Las dos
+pestañas usan ``recalcular_derivadas``: al crear la agenda para todas las
+filas y al actualizarla solo para los partidos modificados.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def celda_rellena(serie):
+    """Máscara de celdas no vacías en el sentido de Excel (``<>""``).
+
+    Equivale a ``(str(v) if pd.notna(v) else '') != ''`` para cada valor: NaN,
+    None y '' son vacías; 0 y ' ' no.
+    """
+    rellena = serie.notna().to_numpy(copy=True)
+    if (
+        serie.dtype == object
+        or pd.api.types.is_string_dtype(serie.dtype)
+        or isinstance(serie.dtype, pd.CategoricalDtype)
+    ):
+        rellena &= (serie != '').to_numpy(dtype=bool, na_value=False)
+    return rellena
+
+
+def _rellena(df, columna):
+    # Una columna que no existe cuenta como vacía
+    if columna not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return celda_rellena(df[columna])
+
+
+def calcular_visto(df):
+    """Columna "Visto" de ``df``.
+
+    Fórmula de Excel: =SI(Y(J2<>""; M2<>""); "Rellenas"; "Incompletas"),
+    donde J = "Visualización C" y M = "Visualización V".
+    """
+    rellenas = _rellena(df, 'Visualización C') & _rellena(df, 'Visualización V')
+    return np.where(rellenas, 'Rellenas', 'Incompletas')
+
+
+# Columna derivada -> regla que la calcula
+COLUMNAS_DERIVADAS = {
+    'Visto': calcular_visto,
+}
+
+
+def recalcular_derivadas(df, filas=None):
+    """Recalcula en ``df`` (en sitio) las columnas derivadas que tenga.
+
+    ``filas`` es una máscara booleana por posición; si se indica, solo se
+    recalculan esas filas y el resto conserva su valor.
+    """
+    if filas is not None:
+        posiciones = np.flatnonzero(filas)
+        if not len(posiciones):
+            return df
+        subconjunto = df.iloc[posiciones]
+
+    for columna, regla in COLUMNAS_DERIVADAS.items():
+        if columna not in df.columns:
+            continue
+        if filas is None:
+            df[columna] = regla(df)
+        else:
+            nuevos = pd.Series(regla(subconjunto), index=posiciones)
+            serie = df[columna].reset_index(drop=True).mask(filas, nuevos)
+            df[columna] = serie.set_axis(df.index)
+    return df
@@ -0,0 +1,196 @@
+"""Agenda a partir de varios ListaPartidos.csv y varios libros de seguimiento.
+
+Los coordinadores descargan un CSV por competición o provincia. En lugar de
+procesar cada uno por separado y juntar los Excel a mano, aquí se leen todos a
+la vez en un pool de hilos (la lectura del CSV en C y el parseo del XML sueltan
+buena parte del tiempo el GIL, y los datos ya están en memoria: no compensa
+copiarlos a otros procesos), se quitan los partidos repetidos por su
+``Código Partido`` y se cruzan con una única tabla de seguimiento combinada.
+
+Cada archivo se lee por separado: si uno falla, su error queda en el informe y
+el resto sigue adelante.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from procesador.esquema import concatenar, describir_avisos
+from procesador.indice_seguimiento import CLAVE_SEGUIMIENTO, informe_duplicados
+from procesador.rendimiento import etapa
+
+# Columna que identifica cada partido en ListaPartidos.csv
+CODIGO_PARTIDO = 'Código Partido'
+
+# Excel no admite estos caracteres en el nombre de una hoja (ni un apóstrofo al principio o al
+# final), ni nombres de más de 31
+_CARACTERES_HOJA = re.compile(r'[\[\]:*?/\\]')
+_LARGO_HOJA = 31
+
+
+def _filas(resultado):
+    # Filas de lo leído: un DataFrame o una tupla que empieza por uno
+    df = resultado[0] if isinstance(resultado, tuple) else resultado
+    return len(df)
+
+
+def leer_en_paralelo(nombre_etapa, archivos, leer, progreso=None, max_workers=None):
+    """Lee ``archivos`` (pares ``(nombre, argumento)``) con ``leer(argumento)`` en paralelo.
+
+    Devuelve, en el mismo orden, un dict por archivo con ``archivo``,
+    ``resultado``, ``filas``, ``segundos`` y ``error`` (el mensaje si la
+    lectura falló; entonces ``resultado`` es None). ``progreso(hechos, total)``
+    se llama en este hilo cada vez que termina un archivo.
+    """
+    def leer_uno(nombre, argumento):
+        inicio = time.perf_counter()
+        try:
+            resultado = leer(argumento)
+            return {'archivo': nombre, 'resultado': resultado, 'filas': _filas(resultado),
+                    'segundos': time.perf_counter() - inicio, 'error': None}
+        except Exception as e:
+            return {'archivo': nombre, 'resultado': None, 'filas': 0,
+                    'segundos': time.perf_counter() - inicio, 'error': str(e) or type(e).__name__}
+
+    lecturas = [None] * len(archivos)
+    with etapa(nombre_etapa) as registro:
+        pool = ThreadPoolExecutor(max_workers=max_workers or min(len(archivos), os.cpu_count() or 4) or 1,
+                                  thread_name_prefix='lectura')
+        try:
+            futuros = {pool.submit(leer_uno, nombre, argumento): i for i, (nombre, argumento) in enumerate(archivos)}
+            for hechos, futuro in enumerate(as_completed(futuros), start=1):
+                lecturas[futuros[futuro]] = futuro.result()
+                if progreso is not None:
+                    progreso(hechos, len(archivos))
+        finally:
+            # Si se cancela a medias, los archivos que no han empezado ya no se leen
+            pool.shutdown(wait=True, cancel_futures=True)
+        registro.filas_salida = sum(lectura['filas'] for lectura in lecturas)
+    return lecturas
+
+
+def _correctas(lecturas, que):
+    resultados = [lectura['resultado'] for lectura in lecturas if lectura['error'] is None]
+    if not resultados:
+        errores = '; '.join(f"{lectura['archivo']}: {lectura['error']}" for lectura in lecturas)
+        raise ValueError(f"No se ha podido leer ningún archivo de {que} ({errores})")
+    return resultados
+
+
+def sin_repetidos(archivos):
+    """Quita de ``archivos`` (tuplas ``(nombre, datos, huella)``) los de contenido repetido.
+
+    Se queda el primero de cada huella. Devuelve ``(archivos, repetidos)``, con
+    los nombres de los que se han quitado. Así un mismo libro subido dos veces
+    no se lee dos veces a la vez.
+    """
+    vistos = set()
+    unicos, repetidos = [], []
+    for archivo in archivos:
+        if archivo[2] in vistos:
+            repetidos.append(archivo[0])
+        else:
+            vistos.add(archivo[2])
+            unicos.append(archivo)
+    return unicos, repetidos
+
+
+def partidos_combinados(lecturas):
+    """Une los partidos leídos sin error y quita los repetidos por ``Código Partido``.
+
+    Ante un mismo código en varios archivos (o filas) se queda la primera
+    aparición; las filas sin código se conservan todas. Devuelve
+    ``(df_partidos, repetidos)``, ya sin la columna ``Código Partido``.
+    """
+    with etapa('combinar_partidos', filas_entrada=sum(lectura['filas'] for lectura in lecturas)) as registro:
+        df_partidos = concatenar(_correctas(lecturas, 'partidos'))
+        repetidos = 0
+        if CODIGO_PARTIDO in df_partidos.columns:
+            codigos = df_partidos[CODIGO_PARTIDO]
+            repetidas = (codigos.notna() & codigos.duplicated()).to_numpy()
+            repetidos = int(repetidas.sum())
+            if repetidos:
+                df_partidos = df_partidos[~repetidas].reset_index(drop=True)
+            df_partidos = df_partidos.drop(columns=CODIGO_PARTIDO)
+        registro.filas_salida = len(df_partidos)
+    return df_partidos, repetidos
+
+
+def seguimiento_combinado(lecturas):
+    """Tabla de seguimiento única a partir de los libros leídos sin error.
+
+    Cada lectura es ``(df_seguimiento, duplicados)``, como devuelve
+    ``cargar_indice``. Si un club (misma competición) está en varios libros
+    vale el del primero; los repetidos dentro de un mismo libro se mantienen
+    y se informan como siempre. Devuelve ``(df_seguimiento, duplicados)``.
+    """
+    tablas = _correctas(lecturas, 'seguimiento')
+    if len(tablas) == 1:
+        return tablas[0]
+
+    with etapa('combinar_seguimiento', filas_entrada=sum(len(df) for df, _ in tablas)) as registro:
+        df_seguimiento = pd.concat([df for df, _ in tablas], ignore_index=True)
+        libro = np.repeat(np.arange(len(tablas)), [len(df) for df, _ in tablas])
+        primer_libro = (
+            pd.Series(libro).groupby([df_seguimiento[col] for col in CLAVE_SEGUIMIENTO], dropna=False)
+            .transform('min')
+            .to_numpy()
+        )
+        df_seguimiento = df_seguimiento[libro == primer_libro].reset_index(drop=True)
+        registro.filas_salida = len(df_seguimiento)
+    return df_seguimiento, informe_duplicados(df_seguimiento)
+
+
+def informe_lecturas(lecturas, tipo):
+    """Filas para mostrar el resultado de cada archivo: tiempo, filas, avisos o error."""
+    filas = []
+    for lectura in lecturas:
+        if lectura['error'] is not None:
+            estado = f"❌ {lectura['error']}"
+        else:
+            df = lectura['resultado'][0] if isinstance(lectura['resultado'], tuple) else lectura['resultado']
+            avisos = describir_avisos(df.attrs.get('avisos', {}))
+            estado = f"⚠️ {'; '.join(avisos)}" if avisos else "✅"
+        filas.append({
+            'Archivo': lectura['archivo'],
+            'Tipo': tipo,
+            'Filas': lectura['filas'],
+            'Segundos': round(lectura['segundos'], 3),
+            'Estado': estado,
+        })
+    return filas
+
+
+def nombre_hoja(texto, usados):
+    """Nombre de hoja válido en Excel para ``texto``, distinto de los de ``usados``."""
+    base = _CARACTERES_HOJA.sub('', str(texto)).strip().strip("'") or 'Hoja'
+    nombre = base[:_LARGO_HOJA]
+    numero = 2
+    while nombre.lower() in usados:
+        sufijo = f' ({numero})'
+        nombre = base[:_LARGO_HOJA - len(sufijo)] + sufijo
+        numero += 1
+    usados.add(nombre.lower())
+    return nombre
+
+
+def hojas_por_provincia(df_agenda):
+    """Pares ``(nombre_hoja, df)`` con los partidos de cada provincia, en orden alfabético.
+
+    Los partidos sin provincia van a la hoja "Sin provincia", al final. Una
+    agenda vacía sale como una única hoja vacía.
+    """
+    if not len(df_agenda):
+        yield 'Resultado', df_agenda
+        return
+    usados = set()
+    provincias = df_agenda['Provincia']
+    for provincia in sorted(provincias.dropna().unique(), key=str):
+        yield nombre_hoja(provincia, usados), df_agenda[(provincias == provincia).to_numpy()]
+    sin_provincia = provincias.isna().to_numpy()
+    if sin_provincia.any():
+        yield nombre_hoja("Sin provincia", usados), df_agenda[sin_provincia]
@@ -0,0 +1,130 @@
+"""Emparejamiento de partidos entre dos agendas.
+
+Emparejar por una sola columna o por posición de fila se rompe en cuanto la
+agenda nueva tiene un partido más o menos: todas las filas siguientes se
+desplazan. Aquí los partidos se identifican por una clave compuesta (por
+defecto competición, jornada y los dos clubes), convertida en un hash de 64
+bits por fila de forma vectorizada.
+
+Lo que siga sin pareja puede emparejarse de forma aproximada (p. ej. un club
+que cambia "Alcala" por "Alcalá"): solo se comparan partidos del mismo bloque
+(misma competición y jornada), así que el coste crece con el tamaño de los
+bloques y no con el producto de las dos agendas.
+"""
+
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from procesador.esquema import como_texto
+
+# Columnas que identifican un partido en la agenda
+CLAVE_PARTIDO = ['Competicion', 'Jornada', 'Nombre Club Casa', 'Nombre Club Visitante']
+
+# Solo se comparan de forma aproximada partidos con los mismos valores en estas columnas
+COLUMNAS_BLOQUE = ['Competicion', 'Jornada']
+
+# Parecido mínimo (0-1, difflib) para aceptar una pareja aproximada
+UMBRAL_APROXIMADO = 0.85
+
+
+def _texto_valor(valor):
+    # str() del valor, pero un float entero se escribe como entero (1.0 -> '1')
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _texto_clave(serie):
+    """Texto de cada valor de ``serie`` para las claves de partido.
+
+    Es ``str()`` (NaN incluido) salvo en los números enteros guardados como
+    float: ``read_excel`` deja una columna de enteros como float en cuanto
+    tiene una celda vacía, y la jornada 1 de una agenda debe ser la 1.0 de la
+    otra.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        textos = np.append(serie.cat.categories.map(_texto_valor).to_numpy(dtype=object), 'nan')
+        return pd.Series(textos[serie.cat.codes.to_numpy()], index=serie.index, name=serie.name)
+    if pd.api.types.is_float_dtype(serie.dtype):
+        valores = serie.to_numpy(dtype=np.float64)
+        textos = valores.astype(str).astype(object)
+        enteros = np.isfinite(valores) & (valores == np.floor(valores))
+        textos[enteros] = valores[enteros].astype(np.int64).astype(str)
+        return pd.Series(textos, index=serie.index, name=serie.name)
+    if serie.dtype == object:
+        return serie.map(_texto_valor)
+    return como_texto(serie)
+
+
+def claves_compuestas(df, columnas):
+    """Hash (uint64) por fila de los valores de ``columnas`` tomados como texto.
+
+    Como con la columna ID, cada valor se compara como texto (NaN incluido),
+    de modo que 3 y '3' son la misma jornada en las dos agendas; también 3.0
+    (ver ``_texto_clave``).
+    """
+    textos = pd.DataFrame({col: _texto_clave(df[col]).to_numpy() for col in columnas}, index=pd.RangeIndex(len(df)))
+    return pd.util.hash_pandas_object(textos, index=False).to_numpy()
+
+
+def _texto_partido(df, columnas, filas):
+    # Texto con el que se compara cada partido, sin mayúsculas ni espacios sobrantes
+    partes = [_texto_clave(df[col].iloc[filas]).str.strip().str.lower().to_numpy() for col in columnas]
+    return [' | '.join(valores) for valores in zip(*partes)]
+
+
+def emparejar_aproximado(df_martes, df_miercoles, filas_martes, filas_miercoles,
+                         columnas_clave=CLAVE_PARTIDO, columnas_bloque=COLUMNAS_BLOQUE,
+                         umbral=UMBRAL_APROXIMADO):
+    """Parejas aproximadas entre filas sin pareja de ambas agendas.
+
+    ``filas_martes`` y ``filas_miercoles`` son posiciones aún libres. Dentro de
+    cada bloque se compara el texto de ``columnas_clave`` (sin las de bloque) y
+    se aceptan, de mayor a menor parecido, las parejas por encima de ``umbral``
+    con ambas filas libres. Devuelve ``(filas_miercoles, filas_martes)``
+    emparejadas. Si falta alguna columna de bloque no se empareja nada.
+    """
+    vacio = (np.array([], dtype=np.intp), np.array([], dtype=np.intp))
+    comunes = set(df_martes.columns) & set(df_miercoles.columns)
+    if not len(filas_martes) or not len(filas_miercoles) or not set(columnas_bloque) <= comunes:
+        return vacio
+    columnas_texto = [col for col in columnas_clave if col in comunes and col not in columnas_bloque]
+    if not columnas_texto:
+        return vacio
+
+    filas_martes = np.asarray(filas_martes, dtype=np.intp)
+    filas_miercoles = np.asarray(filas_miercoles, dtype=np.intp)
+    bloque_martes = claves_compuestas(df_martes.iloc[filas_martes], columnas_bloque)
+    bloque_miercoles = claves_compuestas(df_miercoles.iloc[filas_miercoles], columnas_bloque)
+    texto_martes = _texto_partido(df_martes, columnas_texto, filas_martes)
+    texto_miercoles = _texto_partido(df_miercoles, columnas_texto, filas_miercoles)
+
+    candidatos_por_bloque = pd.Series(np.arange(len(filas_martes))).groupby(bloque_martes).indices
+
+    origen, destino = [], []
+    for bloque, posiciones in pd.Series(np.arange(len(filas_miercoles))).groupby(bloque_miercoles).indices.items():
+        candidatos = candidatos_por_bloque.get(bloque)
+        if candidatos is None:
+            continue
+        parejas = []
+        for i in posiciones:
+            comparador = SequenceMatcher(None, b=texto_miercoles[i], autojunk=False)
+            for j in candidatos:
+                comparador.set_seq1(texto_martes[j])
+                # quick_ratio es una cota superior barata: descarta sin calcular ratio()
+                if comparador.quick_ratio() >= umbral:
+                    parecido = comparador.ratio()
+                    if parecido >= umbral:
+                        parejas.append((-parecido, i, j))
+        usados_i, usados_j = set(), set()
+        for _, i, j in sorted(parejas):
+            if i in usados_i or j in usados_j:
+                continue
+            usados_i.add(i)
+            usados_j.add(j)
+            origen.append(filas_miercoles[i])
+            destino.append(filas_martes[j])
+
+    return np.array(origen, dtype=np.intp), np.array(destino, dtype=np.intp)
@@ -0,0 +1,227 @@
+"""Tipos de las columnas de ListaPartidos.csv y de las agendas.
+
+Todo se cargaba como ``object``: un objeto ``str`` de Python por celda aunque
+una columna como Competición solo tenga unas decenas de valores distintos. Con
+un esquema declarado, las columnas de pocos valores (competiciones, jornadas,
+clubes, campos) se leen como categorías (un código entero por fila y cada
+texto una sola vez), el texto libre como cadenas de Arrow y las fechas y horas
+con un formato explícito. Cualquier cálculo por valor (extraer la provincia,
+interpretar o formatear la fecha) se hace una vez por valor distinto y se
+reparte a las filas con sus códigos.
+
+``tipar`` convierte y valida en la misma pasada: devuelve el DataFrame y los
+avisos (columnas que faltan y valores que no encajan en su tipo).
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+CATEGORIA = 'categoria'
+CATEGORIA_NUMERICA = 'categoria_numerica'
+TEXTO = 'texto'
+FECHA = 'fecha'
+HORA = 'hora'
+
+# Formatos de ListaPartidos.csv (y de las agendas que se generan)
+FORMATO_FECHA = '%d/%m/%Y'
+FORMATO_HORA = '%H:%M'
+
+# Texto libre: cadenas de Arrow (pyarrow ya es dependencia para Parquet)
+TIPO_TEXTO = pd.StringDtype('pyarrow')
+
+# Columnas de ListaPartidos.csv que usa el proceso y su tipo
+ESQUEMA_PARTIDOS = {
+    'Fecha': FECHA,
+    'Hora': HORA,
+    'Jornada': CATEGORIA_NUMERICA,
+    'Competición': CATEGORIA,
+    'Grupo': CATEGORIA,
+    'Nombre Club Casa': CATEGORIA,
+    'Nombre Club Visitante': CATEGORIA,
+    'Campo': CATEGORIA,
+    'Dirección Campo': TEXTO,
+    'Código Partido': TEXTO,
+}
+
+# Columnas sin las que no se puede montar la agenda
+OBLIGATORIAS_PARTIDOS = ['Fecha', 'Hora', 'Jornada', 'Competición', 'Grupo', 'Nombre Club Casa',
+                         'Nombre Club Visitante', 'Campo', 'Dirección Campo']
+
+# Columnas de una agenda ya generada. Fecha y Hora son categorías sin
+# interpretar: vuelven a Excel tal cual se leyeron. "Visto" no se tipa porque
+# se recalcula con valores que pueden no estar entre sus categorías.
+ESQUEMA_AGENDA = {
+    'Fecha': CATEGORIA,
+    'Hora': CATEGORIA,
+    'Jornada': CATEGORIA,
+    'Competicion': CATEGORIA,
+    'Provincia': CATEGORIA,
+    'Nombre Club Casa': CATEGORIA,
+    'Nombre Club Visitante': CATEGORIA,
+    'Campo': CATEGORIA,
+    'Técnico': TEXTO,
+    'Motivo': TEXTO,
+    'Visualización C': TEXTO,
+    'Detalles Equipo Casa': TEXTO,
+    'Visualización V': TEXTO,
+    'Detalles Equipo Visitante': TEXTO,
+    'Dirección Campo': TEXTO,
+}
+
+
+def tipos_lectura(esquema):
+    """``dtype`` de ``pd.read_csv`` para leer directamente con los tipos de ``esquema``.
+
+    Fechas, horas y jornadas se leen como categorías de texto y ``tipar`` las
+    interpreta después, una vez por valor distinto.
+    """
+    return {columna: TIPO_TEXTO if tipo == TEXTO else 'category' for columna, tipo in esquema.items()}
+
+
+def por_categoria(serie, funcion):
+    """Aplica ``funcion`` a los valores distintos de ``serie`` y lo reparte a sus filas.
+
+    ``funcion`` recibe las categorías (un ``Index``) y devuelve un valor por
+    categoría. El resultado es categórico; los vacíos siguen vacíos.
+    """
+    serie = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype('category')
+    codigos_valor, valores = pd.factorize(pd.Index(funcion(serie.cat.categories)))
+    codigos = serie.cat.codes.to_numpy()
+    if len(codigos_valor):
+        codigos = np.where(codigos >= 0, codigos_valor.take(codigos, mode='clip'), -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=valores), index=serie.index, name=serie.name)
+
+
+def como_texto(serie):
+    """``str()`` de cada valor como en una columna ``object`` (vacíos como 'nan').
+
+    Sirve para comparar claves entre columnas tipadas y sin tipar: una
+    categoría o una cadena de Arrow dan el mismo texto que su valor en
+    ``object``. En las categóricas se convierte cada categoría una sola vez.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        textos = np.append(serie.cat.categories.map(str).to_numpy(dtype=object), 'nan')
+        return pd.Series(textos[serie.cat.codes.to_numpy()], index=serie.index, name=serie.name)
+    if serie.dtype != object and pd.api.types.is_string_dtype(serie.dtype):
+        return pd.Series(serie.to_numpy(dtype=object, na_value='nan'), index=serie.index, name=serie.name)
+    return serie.map(str)
+
+
+def leer_fechas(serie, formato=FORMATO_FECHA):
+    """Fechas de ``serie`` (datetime64); las que no se entienden quedan en NaT.
+
+    Cada valor distinto se interpreta una vez con ``formato``; los que no
+    encajan se reintentan como ISO 8601 (``2025-09-07``, o una fecha de Excel
+    escrita como texto) y, si tampoco, con el día primero, como hacía la agenda
+    antes. Con el día primero ``2025-09-07`` saldría 9 de julio.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        return serie
+    codigos, valores = pd.factorize(serie)
+    if not len(valores):
+        return pd.Series(pd.NaT, index=serie.index, name=serie.name, dtype='datetime64[ns]')
+    fechas = pd.to_datetime(pd.Series(valores, dtype=object), format=formato, errors='coerce')
+    for opciones in ({'format': 'ISO8601'}, {'dayfirst': True}):
+        fallidas = fechas.isna().to_numpy() & pd.notna(valores)
+        if not fallidas.any():
+            break
+        fechas[fallidas] = pd.to_datetime(
+            pd.Series(valores[fallidas], dtype=object).astype(str), errors='coerce', **opciones
+        ).to_numpy()
+    resultado = fechas.to_numpy().take(codigos, mode='clip')
+    resultado[codigos < 0] = np.datetime64('NaT')
+    return pd.Series(resultado, index=serie.index, name=serie.name, dtype='datetime64[ns]')
+
+
+def texto_fechas(serie, formato=FORMATO_FECHA):
+    """Fechas como texto en ``formato`` (categórico), formateando cada fecha distinta una vez."""
+    return por_categoria(serie, lambda fechas: pd.DatetimeIndex(fechas).strftime(formato))
+
+
+def _categoria_numerica(serie):
+    # Como infiere pandas: si todas las categorías son números, las categorías pasan a números
+    categorias = serie.cat.categories
+    numeros = pd.to_numeric(categorias, errors='coerce')
+    if len(categorias) and not numeros.isna().any() and numeros.is_unique:
+        return serie.cat.rename_categories(numeros)
+    return serie
+
+
+def _es_texto(serie):
+    # Solo textos (o nada): una columna vacía de Excel llega como float con todo NaN
+    if serie.dtype == object:
+        return pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty')
+    return pd.api.types.is_string_dtype(serie.dtype) or bool(serie.isna().all())
+
+
+def tipar(df, esquema, obligatorias=()):
+    """Convierte las columnas de ``df`` al tipo de ``esquema`` y lo valida en la misma pasada.
+
+    Las columnas que no están en el esquema se dejan como vienen. Devuelve
+    ``(df, avisos)``; ``avisos`` tiene ``columnas_faltan`` (de
+    ``obligatorias``) y, por columna, cuántos valores no encajan en su tipo
+    (fechas u horas que no se entienden). Una columna de texto con valores de
+    otro tipo (p. ej. números escritos en Excel) se deja sin convertir.
+    """
+    df = df.copy(deep=False)
+    avisos = {'columnas_faltan': [columna for columna in obligatorias if columna not in df.columns]}
+    for columna, tipo in esquema.items():
+        if columna not in df.columns:
+            continue
+        serie = df[columna]
+        if tipo == TEXTO:
+            if _es_texto(serie):
+                df[columna] = serie.astype(TIPO_TEXTO)
+        elif tipo == FECHA:
+            fechas = leer_fechas(serie)
+            invalidas = int((fechas.isna() & serie.notna()).sum())
+            if invalidas:
+                avisos[columna] = invalidas
+            df[columna] = fechas
+        else:
+            serie = serie.astype('category')
+            if tipo == CATEGORIA_NUMERICA:
+                serie = _categoria_numerica(serie)
+            elif tipo == HORA:
+                horas = pd.to_datetime(pd.Series(serie.cat.categories, dtype=object).astype(str),
+                                       format=FORMATO_HORA, errors='coerce')
+                invalidas = int(np.isin(serie.cat.codes.to_numpy(), np.flatnonzero(horas.isna())).sum())
+                if invalidas:
+                    avisos[columna] = invalidas
+            df[columna] = serie
+    return df, avisos
+
+
+def concatenar(dfs):
+    """``pd.concat`` de ``dfs`` conservando las columnas categóricas.
+
+    ``pd.concat`` convierte en ``object`` una categórica cuyas categorías no
+    coinciden en todas las tablas; aquí se unen antes las categorías de cada
+    columna. Si no se pueden unir (p. ej. números en una tabla y textos en
+    otra) la columna queda como ``object``.
+    """
+    dfs = [df.copy(deep=False) for df in dfs]
+    if len(dfs) > 1:
+        for columna in dfs[0].columns:
+            series = [df[columna] for df in dfs if columna in df.columns]
+            if len(series) != len(dfs) or not all(isinstance(serie.dtype, pd.CategoricalDtype) for serie in series):
+                continue
+            try:
+                categorias = union_categoricals(series).categories
+            except TypeError:
+                continue
+            for df in dfs:
+                df[columna] = df[columna].cat.set_categories(categorias)
+    return pd.concat(dfs, ignore_index=True)
+
+
+def describir_avisos(avisos):
+    """Avisos de ``tipar`` en frases para mostrar al usuario."""
+    frases = []
+    if avisos.get('columnas_faltan'):
+        frases.append(f"Faltan las columnas {', '.join(avisos['columnas_faltan'])}")
+    for columna, cuantos in avisos.items():
+        if columna != 'columnas_faltan' and cuantos:
+            frases.append(f"{cuantos} valores de '{columna}' no tienen un formato válido")
+    return frases
@@ -0,0 +1,134 @@
+"""Exportación de agendas para descarga.
+
+El .xlsx se escribe fila a fila con el modo de memoria constante de
+xlsxwriter: cada fila se vuelca a un temporal en cuanto se empieza la
+siguiente, así que no se acumulan las tablas de celdas en memoria como con
+``pd.ExcelWriter``. CSV y Parquet son alternativas mucho más rápidas de
+escribir y de leer para otras herramientas.
+"""
+
+from io import BytesIO
+
+import pandas as pd
+import xlsxwriter
+
+from procesador.rendimiento import etapa
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_CSV = "text/csv"
+MIME_PARQUET = "application/vnd.apache.parquet"
+
+# Formato con el que se muestran las fechas en la agenda
+FORMATO_FECHA = 'dd/mm/yyyy'
+
+# Formato de la cabecera, el mismo que pone pandas
+_FORMATO_CABECERA = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+
+def _escribir_bloques(libro, hoja, bloques):
+    cabecera = libro.add_format(_FORMATO_CABECERA)
+    fila = 0
+    for bloque in bloques:
+        if fila == 0:
+            hoja.write_row(0, 0, [str(col) for col in bloque.columns], cabecera)
+            fila = 1
+        for valores in bloque.itertuples(index=False, name=None):
+            for columna, valor in enumerate(valores):
+                # Las celdas vacías no se escriben, como hace pandas
+                if not pd.isna(valor):
+                    hoja.write(fila, columna, valor)
+            fila += 1
+
+
+def _libro(output):
+    return xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': FORMATO_FECHA,
+        'remove_timezone': True,
+    })
+
+
+def exportar_excel_por_bloques(bloques, sheet_name):
+    """Escribe en un .xlsx los DataFrames de ``bloques`` uno detrás de otro.
+
+    Solo hay en memoria el bloque actual. La cabecera sale del primer bloque;
+    las fechas (``Fecha`` cuando llega como datetime) se escriben como fechas
+    de Excel con formato ``dd/mm/yyyy`` y los textos tal cual.
+    """
+    output = BytesIO()
+    libro = _libro(output)
+    _escribir_bloques(libro, libro.add_worksheet(sheet_name), bloques)
+    libro.close()
+    # Sin copia: getvalue() devuelve el propio búfer si no se ha exportado antes
+    return output.getvalue()
+
+
+def exportar_excel_por_hojas(hojas):
+    """.xlsx con una hoja por cada par ``(nombre, df)`` de ``hojas``, en ese orden.
+
+    Las hojas se escriben una detrás de otra con memoria constante, así que
+    ``hojas`` puede ser un generador. Los nombres deben ser válidos en Excel.
+    """
+    output = BytesIO()
+    libro = _libro(output)
+    filas = 0
+    with etapa('exportar_xlsx') as registro:
+        for nombre, df in hojas:
+            _escribir_bloques(libro, libro.add_worksheet(nombre), [df])
+            filas += len(df)
+        registro.filas_salida = filas
+        libro.close()
+    return output.getvalue()
+
+
+def exportar_excel(df, sheet_name):
+    """Serializa ``df`` a un .xlsx en memoria y devuelve sus bytes."""
+    return exportar_excel_por_bloques([df], sheet_name)
+
+
+def exportar_csv(df):
+    """CSV con ';' y UTF-8 con BOM (Excel lo abre con tildes correctas)."""
+    output = BytesIO()
+    df.to_csv(output, sep=';', index=False, encoding='utf-8-sig')
+    return output.getvalue()
+
+
+def _textos_mezclados(df):
+    # Parquet exige un tipo por columna: las columnas object (o categóricas de
+    # object) con valores de varios tipos (p. ej. Jornada con números y textos)
+    # se pasan a texto
+    df = df.copy()
+    for col in df.columns:
+        tipo = df[col].dtype
+        if isinstance(tipo, pd.CategoricalDtype) and tipo.categories.dtype == object:
+            df[col] = df[col].astype(object)
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def exportar_parquet(df):
+    """Parquet (pyarrow) con las columnas tal cual, sin el índice."""
+    output = BytesIO()
+    try:
+        df.to_parquet(output, index=False)
+    except (TypeError, ValueError):
+        output = BytesIO()
+        _textos_mezclados(df).to_parquet(output, index=False)
+    return output.getvalue()
+
+
+# Formato -> (extensión, tipo MIME, función que exporta df y nombre de hoja)
+FORMATOS = {
+    'xlsx': ('xlsx', MIME_XLSX, exportar_excel),
+    'csv': ('csv', MIME_CSV, lambda df, sheet_name: exportar_csv(df)),
+    'parquet': ('parquet', MIME_PARQUET, lambda df, sheet_name: exportar_parquet(df)),
+}
+
+
+def exportar(df, formato, sheet_name):
+    """Bytes de ``df`` en ``formato`` (una clave de ``FORMATOS``)."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación desconocido: {formato!r} (opciones: {', '.join(FORMATOS)})")
+    with etapa(f'exportar_{formato}', filas_entrada=len(df)):
+        return FORMATOS[formato][2](df, sheet_name)
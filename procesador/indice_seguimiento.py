@@ -0,0 +1,133 @@
+"""Índice compilado en disco del Excel de seguimiento.
+
+El libro de seguimiento cambia poco, pero cada agenda lo volvía a leer. Aquí
+se guarda la tabla (Competicion, Nombre Club) -> (Visualización, Detalles
+Equipo) en Parquet, con el SHA-256 del libro en el nombre del archivo: solo se
+reconstruye cuando cambia el contenido del libro, y cargarla lleva
+milisegundos. Junto al índice se guarda un informe de claves duplicadas, que
+en los merges por la izquierda multiplican filas sin avisar.
+
+Uso sin interfaz::
+
+    python -m procesador.indice_seguimiento Seguimiento_ligas.xlsm
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+from procesador.cache import huella
+from procesador.rendimiento import etapa
+from procesador.seguimiento import leer_seguimiento
+
+CLAVE_SEGUIMIENTO = ['Competicion', 'Nombre Club Casa']
+
+DIRECTORIO_INDICES = Path(
+    os.environ.get('PROCESADOR_DIR_INDICES', Path.home() / '.cache' / 'procesador-futbol' / 'indices')
+)
+
+
+def informe_duplicados(df_seguimiento):
+    """Claves (Competicion, Nombre Club Casa) que aparecen más de una vez, con su número de filas."""
+    repetidas = df_seguimiento[df_seguimiento.duplicated(CLAVE_SEGUIMIENTO, keep=False)]
+    return (
+        repetidas.groupby(CLAVE_SEGUIMIENTO, dropna=False, sort=True)
+        .size()
+        .rename('Filas')
+        .reset_index()
+    )
+
+
+def _escribir_atomico(ruta, escribir):
+    # Cada escritor usa su propio temporal (las sesiones y los trabajos comparten proceso)
+    # y lo renombra al terminar: quien lea ``ruta`` ve el archivo completo o ninguno
+    descriptor, nombre = tempfile.mkstemp(dir=ruta.parent, prefix=f'{ruta.name}.', suffix='.tmp')
+    os.close(descriptor)
+    temporal = Path(nombre)
+    try:
+        escribir(temporal)
+        try:
+            os.replace(temporal, ruta)
+        except OSError:
+            # En Windows no se reemplaza un archivo que otro está leyendo. El nombre lleva la
+            # huella del libro: si otro escritor ya lo ha dejado en su sitio, es el mismo contenido
+            if not ruta.exists():
+                raise
+    finally:
+        if temporal.exists():
+            temporal.unlink()
+
+
+def _guardar_tabla(df, base):
+    try:
+        _escribir_atomico(base.with_suffix('.parquet'), lambda ruta: df.to_parquet(ruta))
+    except (TypeError, ValueError):
+        # Parquet no admite columnas con tipos mezclados (p. ej. textos y números
+        # en la misma columna); en ese caso se guarda tal cual en pickle
+        _escribir_atomico(base.with_suffix('.pkl'), lambda ruta: df.to_pickle(ruta))
+
+
+def _cargar_tabla(base):
+    if base.with_suffix('.parquet').exists():
+        return pd.read_parquet(base.with_suffix('.parquet'))
+    if base.with_suffix('.pkl').exists():
+        return pd.read_pickle(base.with_suffix('.pkl'))
+    return None
+
+
+def cargar_indice(fuente, directorio=None):
+    """Devuelve ``(df_seguimiento, duplicados)`` del libro de seguimiento.
+
+    ``fuente`` son los bytes del libro o su ruta. Si ya existe un índice para
+    ese contenido se carga de disco; si no, se lee el libro y se guarda.
+    """
+    if isinstance(fuente, (str, os.PathLike)):
+        fuente = Path(fuente).read_bytes()
+    directorio = Path(directorio) if directorio is not None else DIRECTORIO_INDICES
+    base = directorio / f'seguimiento-{huella(fuente)}'
+    ruta_informe = base.with_suffix('.duplicados.json')
+
+    with etapa('cargar_indice_seguimiento') as registro:
+        df_seguimiento = _cargar_tabla(base)
+        if df_seguimiento is not None and ruta_informe.exists():
+            duplicados = pd.DataFrame(
+                json.loads(ruta_informe.read_text(encoding='utf-8')),
+                columns=CLAVE_SEGUIMIENTO + ['Filas'],
+            )
+            registro.filas_salida = len(df_seguimiento)
+            return df_seguimiento, duplicados
+
+    with etapa('leer_seguimiento') as registro:
+        df_seguimiento = leer_seguimiento(BytesIO(fuente))
+        registro.filas_salida = len(df_seguimiento)
+    duplicados = informe_duplicados(df_seguimiento)
+
+    directorio.mkdir(parents=True, exist_ok=True)
+    _guardar_tabla(df_seguimiento, base)
+    _escribir_atomico(
+        ruta_informe,
+        lambda ruta: ruta.write_text(duplicados.to_json(orient='records', force_ascii=False), encoding='utf-8'),
+    )
+    return df_seguimiento, duplicados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila el índice del Excel de seguimiento de ligas.")
+    parser.add_argument('excel', help="Ruta a Seguimiento_ligas.xlsm")
+    parser.add_argument('--directorio', help=f"Carpeta de índices (por defecto {DIRECTORIO_INDICES})")
+    args = parser.parse_args(argv)
+
+    df_seguimiento, duplicados = cargar_indice(args.excel, args.directorio)
+    print(f"{len(df_seguimiento)} filas en el índice")
+    if len(duplicados):
+        print(f"{len(duplicados)} claves duplicadas (multiplican filas en la agenda):")
+        print(duplicados.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
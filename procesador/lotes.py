@@ -0,0 +1,172 @@
+"""Procesamiento por lotes sin interfaz.
+
+Lee un manifiesto JSON con una lista de trabajos y los ejecuta en un pool de
+procesos (la lectura con openpyxl usa un solo núcleo por archivo, así que el
+rendimiento crece con el número de núcleos)::
+
+    python -m procesador manifiesto.json --salida resultados --workers 8
+
+Cada trabajo del manifiesto es un objeto con ``tipo`` ``"crear"`` (pestaña 1)
+o ``"actualizar"`` (pestaña 2)::
+
+    [
+      {"nombre": "sevilla", "tipo": "crear",
+       "csv": "sevilla/ListaPartidos.csv", "seguimiento": "Seguimiento_ligas.xlsm"},
+      {"nombre": "sevilla-miercoles", "tipo": "actualizar",
+       "base": "sevilla/agenda_martes.xlsx", "nueva": "sevilla/agenda_miercoles.xlsx",
+       "columnas": ["Fecha", "Hora", "Campo", "Dirección Campo"],
+       "columna_id": ["Competicion", "Jornada", "Nombre Club Casa", "Nombre Club Visitante"],
+       "aproximada": true}
+    ]
+
+Las rutas relativas se resuelven desde la carpeta del manifiesto. ``formato``
+es opcional (``"xlsx"``, ``"csv"`` o ``"parquet"``; por defecto ``"xlsx"``) y
+``salida`` también (por defecto ``<salida>/<nombre>.<formato>``). ``columna_id``
+puede ser una columna, una lista (clave compuesta) o ``null`` (posición de
+fila); con ``aproximada`` los partidos sin pareja se emparejan por parecido.
+Al terminar se escribe ``resumen.json`` con el estado, el tiempo, el número
+de filas y los tiempos por etapa de cada trabajo.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from procesador.actualizacion import COLUMNAS_POR_DEFECTO, COLUMNAS_PROTEGIDAS
+from procesador.exportacion import FORMATOS, exportar
+from procesador.pipeline import actualizar_agenda_desde_archivos, crear_agenda_desde_archivos
+from procesador.rendimiento import Perfil
+
+CAMPOS_OBLIGATORIOS = {
+    'crear': ['csv', 'seguimiento'],
+    'actualizar': ['base', 'nueva'],
+}
+
+
+def leer_manifiesto(ruta, directorio_salida):
+    """Carga el manifiesto y resuelve las rutas de entrada y salida de cada trabajo."""
+    ruta = Path(ruta)
+    trabajos = json.loads(ruta.read_text(encoding='utf-8'))
+    if not isinstance(trabajos, list):
+        raise ValueError("El manifiesto debe ser una lista de trabajos")
+
+    raiz = ruta.parent
+    directorio_salida = Path(directorio_salida)
+    resueltos = []
+    for numero, trabajo in enumerate(trabajos, start=1):
+        trabajo = dict(trabajo)
+        trabajo.setdefault('nombre', f'trabajo_{numero}')
+        for campo in ('csv', 'seguimiento', 'base', 'nueva'):
+            if campo in trabajo:
+                trabajo[campo] = str(raiz / trabajo[campo])
+        trabajo.setdefault('formato', 'xlsx')
+        extension = FORMATOS[trabajo['formato']][0] if trabajo['formato'] in FORMATOS else trabajo['formato']
+        salida = trabajo.get('salida') or f"{trabajo['nombre']}.{extension}"
+        trabajo['salida'] = str(directorio_salida / salida)
+        resueltos.append(trabajo)
+    return resueltos
+
+
+def ejecutar_trabajo(trabajo):
+    """Ejecuta un trabajo del manifiesto y devuelve su resumen (nunca lanza excepciones)."""
+    inicio = time.perf_counter()
+    resumen = {
+        'nombre': trabajo.get('nombre'),
+        'tipo': trabajo.get('tipo'),
+        'salida': trabajo.get('salida'),
+        'pid': os.getpid(),
+    }
+    # Tiempos por etapa del trabajo (sin tracemalloc, que ralentiza el proceso)
+    perfil = Perfil(f"lote:{trabajo.get('nombre')}", memoria=False)
+    try:
+        with perfil:
+            tipo = trabajo.get('tipo')
+            if tipo not in CAMPOS_OBLIGATORIOS:
+                raise ValueError(f"Tipo de trabajo desconocido: {tipo!r} (se esperaba 'crear' o 'actualizar')")
+            faltan = [campo for campo in CAMPOS_OBLIGATORIOS[tipo] if not trabajo.get(campo)]
+            if faltan:
+                raise ValueError(f"Faltan campos en el trabajo: {', '.join(faltan)}")
+
+            if tipo == 'crear':
+                df_resultado, duplicados = crear_agenda_desde_archivos(
+                    trabajo['csv'], trabajo['seguimiento'], trabajo.get('directorio_indices')
+                )
+                hoja = 'Resultado'
+                resumen['claves_duplicadas'] = len(duplicados)
+            else:
+                columnas = trabajo.get('columnas') or COLUMNAS_POR_DEFECTO
+                protegidas = [col for col in columnas if col in COLUMNAS_PROTEGIDAS]
+                if protegidas:
+                    raise ValueError(f"No se pueden actualizar columnas protegidas: {', '.join(protegidas)}")
+                df_resultado, stats = actualizar_agenda_desde_archivos(
+                    trabajo['base'], trabajo['nueva'], columnas, trabajo.get('columna_id'),
+                    trabajo.get('aproximada', False)
+                )
+                hoja = 'Agenda_Actualizada'
+                resumen['stats'] = stats
+
+            salida = Path(trabajo['salida'])
+            salida.parent.mkdir(parents=True, exist_ok=True)
+            salida.write_bytes(exportar(df_resultado, trabajo.get('formato', 'xlsx'), hoja))
+
+            resumen['estado'] = 'ok'
+            resumen['filas'] = len(df_resultado)
+    except Exception as e:
+        resumen['estado'] = 'error'
+        resumen['error'] = f"{type(e).__name__}: {e}"
+    resumen['etapas'] = [registro.como_dict() for registro in perfil.etapas]
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumen
+
+
+def ejecutar_lote(trabajos, workers=None):
+    """Ejecuta los trabajos en paralelo y devuelve sus resúmenes en el orden del manifiesto."""
+    if workers == 1:
+        return [ejecutar_trabajo(trabajo) for trabajo in trabajos]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(ejecutar_trabajo, trabajos))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m procesador',
+        description="Crea y actualiza agendas de partidos por lotes, sin interfaz.",
+    )
+    parser.add_argument('manifiesto', help="Archivo JSON con la lista de trabajos")
+    parser.add_argument('--salida', default='salida', help="Carpeta de resultados (por defecto ./salida)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="Procesos en paralelo (por defecto, uno por núcleo)")
+    parser.add_argument('--directorio-indices', help="Carpeta de índices del seguimiento (compartida entre procesos)")
+    args = parser.parse_args(argv)
+
+    trabajos = leer_manifiesto(args.manifiesto, args.salida)
+    if args.directorio_indices:
+        for trabajo in trabajos:
+            trabajo.setdefault('directorio_indices', args.directorio_indices)
+    inicio = time.perf_counter()
+    resumenes = ejecutar_lote(trabajos, args.workers)
+    total = time.perf_counter() - inicio
+
+    for resumen in resumenes:
+        detalle = f"{resumen['filas']} filas" if resumen['estado'] == 'ok' else resumen['error']
+        print(f"[{resumen['estado']:>5}] {resumen['nombre']} ({resumen['segundos']:.2f} s): {detalle}")
+    fallidos = sum(resumen['estado'] != 'ok' for resumen in resumenes)
+    print(f"{len(resumenes) - fallidos}/{len(resumenes)} trabajos correctos en {total:.2f} s "
+          f"con {args.workers} procesos")
+
+    ruta_resumen = Path(args.salida) / 'resumen.json'
+    ruta_resumen.parent.mkdir(parents=True, exist_ok=True)
+    ruta_resumen.write_text(
+        json.dumps({'segundos': round(total, 3), 'workers': args.workers, 'trabajos': resumenes},
+                   ensure_ascii=False, indent=2),
+        encoding='utf-8',
+    )
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
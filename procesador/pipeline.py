@@ -0,0 +1,43 @@
+"""Procesos completos de cada pestaña, de archivos de entrada a resultado.
+
+Sirven tanto para la aplicación como para ejecuciones sin interfaz
+(``python -m procesador``). Las entradas pueden ser rutas, bytes o archivos
+abiertos.
+"""
+
+import os
+from io import BytesIO
+from pathlib import Path
+
+from procesador.actualizacion import actualizar_agenda, leer_agenda
+from procesador.agenda_nueva import crear_agenda, leer_partidos
+from procesador.indice_seguimiento import cargar_indice
+
+
+def _leer_bytes(fuente):
+    if isinstance(fuente, (bytes, bytearray)):
+        return bytes(fuente)
+    if isinstance(fuente, (str, os.PathLike)):
+        return Path(fuente).read_bytes()
+    return fuente.read()
+
+
+def crear_agenda_desde_archivos(csv, seguimiento, directorio_indices=None):
+    """Pestaña 1: ListaPartidos.csv + Seguimiento_ligas.xlsm -> agenda nueva.
+
+    Devuelve ``(df_resultado, duplicados)``, donde ``duplicados`` son las
+    claves repetidas del seguimiento.
+    """
+    df_partidos = leer_partidos(BytesIO(_leer_bytes(csv)))
+    df_seguimiento, duplicados = cargar_indice(_leer_bytes(seguimiento), directorio_indices)
+    return crear_agenda(df_partidos, df_seguimiento), duplicados
+
+
+def actualizar_agenda_desde_archivos(base, nueva, columnas_a_actualizar, columna_id=None, aproximada=False):
+    """Pestaña 2: agenda con trabajo hecho + agenda nueva -> agenda actualizada.
+
+    Devuelve ``(df_actualizado, stats)`` como ``actualizar_agenda``.
+    """
+    df_base = leer_agenda(BytesIO(_leer_bytes(base)))
+    df_nuevo = leer_agenda(BytesIO(_leer_bytes(nueva)))
+    return actualizar_agenda(df_base, df_nuevo, columnas_a_actualizar, columna_id, aproximada)
@@ -0,0 +1,248 @@
+"""Medición por etapas: tiempo, memoria y filas de cada paso del proceso.
+
+Las funciones del procesador marcan sus etapas con ``etapa(...)``; si no hay
+ningún ``Perfil`` activo en el hilo actual no se mide nada y el coste es
+despreciable. Con un perfil activo se guarda, por etapa, el tiempo, el pico de
+RSS del proceso y las filas de entrada y salida. El pico de memoria de Python
+(tracemalloc) sobre lo que había al empezar solo se mide si se pide: tracemalloc
+hace varias veces más lentas las asignaciones (la exportación a .xlsx, sobre todo). En los cruces se avisa si salen
+más filas de las que entran (claves repetidas en un merge por la izquierda).
+
+Al cerrar el perfil cada etapa se añade como una línea JSON al registro
+(``PROCESADOR_LOG_RENDIMIENTO`` o ``~/.cache/procesador-futbol/rendimiento.jsonl``);
+un perfil sin etapas (todo salió de la caché) no escribe nada.
+Opcionalmente se ejecuta todo bajo cProfile para sacar un informe pstats.
+
+tracemalloc y el RSS son del proceso entero: con varias sesiones a la vez las
+cifras de memoria incluyen lo que hagan las demás.
+"""
+
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import pandas as pd
+
+RUTA_LOG = Path(
+    os.environ.get('PROCESADOR_LOG_RENDIMIENTO',
+                   Path.home() / '.cache' / 'procesador-futbol' / 'rendimiento.jsonl')
+)
+
+_perfil_activo = ContextVar('perfil_activo', default=None)
+
+# tracemalloc es global: se arranca con el primer perfil que lo pide y se para con el último
+_lock_tracemalloc = threading.Lock()
+_usuarios_tracemalloc = 0
+_lock_log = threading.Lock()
+
+
+def _rss_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024, 1)
+
+
+def _iniciar_tracemalloc():
+    global _usuarios_tracemalloc
+    with _lock_tracemalloc:
+        if _usuarios_tracemalloc == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _usuarios_tracemalloc += 1
+
+
+def _parar_tracemalloc():
+    global _usuarios_tracemalloc
+    with _lock_tracemalloc:
+        _usuarios_tracemalloc -= 1
+        if _usuarios_tracemalloc == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class Etapa:
+    """Medidas de una etapa. Quien la mide rellena ``filas_salida``."""
+
+    def __init__(self, nombre, filas_entrada=None, cruce=False):
+        self.nombre = nombre
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+        self.cruce = cruce
+        self.segundos = None
+        self.mb_pico = None
+        self.rss_pico_mb = None
+        self._pico_hijas = 0
+
+    @property
+    def multiplica_filas(self):
+        # Un cruce por la izquierda nunca debería devolver más filas de las que recibe
+        return bool(
+            self.cruce and self.filas_entrada is not None and self.filas_salida is not None
+            and self.filas_salida > self.filas_entrada
+        )
+
+    def como_dict(self):
+        return {
+            'etapa': self.nombre,
+            'segundos': self.segundos,
+            'mb_pico': self.mb_pico,
+            'rss_pico_mb': self.rss_pico_mb,
+            'filas_entrada': self.filas_entrada,
+            'filas_salida': self.filas_salida,
+            'multiplica_filas': self.multiplica_filas,
+        }
+
+
+class Perfil:
+    """Recoge las etapas ejecutadas dentro de ``with Perfil(...)`` en este hilo.
+
+    ``memoria`` activa tracemalloc (multiplica el tiempo de las etapas que
+    asignan mucho, así que solo para diagnosticar);
+    ``cprofile`` ejecuta además todo bajo cProfile. ``ruta_log=False`` no
+    escribe el registro. ``al_iniciar_etapa(nombre)`` se llama al empezar
+    cada etapa (para mostrar progreso; si lanza una excepción, la etapa no
+    llega a empezar).
+    """
+
+    def __init__(self, nombre, memoria=False, cprofile=False, ruta_log=None, al_iniciar_etapa=None):
+        self.nombre = nombre
+        self.id = uuid.uuid4().hex[:12]
+        self.memoria = memoria
+        self.ruta_log = RUTA_LOG if ruta_log is None else ruta_log
+        self.etapas = []
+        self.segundos = None
+        self.error_cprofile = None
+        self.al_iniciar_etapa = al_iniciar_etapa
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._abiertas = []
+        self._token = None
+        self._inicio = None
+
+    def __enter__(self):
+        self._token = _perfil_activo.set(self)
+        if self.memoria:
+            _iniciar_tracemalloc()
+        if self._cprofile is not None:
+            try:
+                self._cprofile.enable()
+            except ValueError as e:
+                # Solo puede haber un profiler activo a la vez (p. ej. otra sesión perfilando)
+                self.error_cprofile = str(e)
+                self._cprofile = None
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.segundos = round(time.perf_counter() - self._inicio, 4)
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self.memoria:
+            _parar_tracemalloc()
+        _perfil_activo.reset(self._token)
+        # Sin etapas no se ha calculado nada (p. ej. todo salió de la caché): no se registra
+        if self.ruta_log and self.etapas:
+            self.escribir_log(self.ruta_log)
+        return False
+
+    @contextmanager
+    def _medir(self, registro):
+        if self.al_iniciar_etapa is not None:
+            self.al_iniciar_etapa(registro.nombre)
+        midiendo_memoria = self.memoria and tracemalloc.is_tracing()
+        if midiendo_memoria:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._abiertas.append(registro)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro.segundos = round(time.perf_counter() - inicio, 4)
+            self._abiertas.pop()
+            if midiendo_memoria:
+                # Las etapas anidadas reinician el pico: se tiene en cuenta el suyo
+                pico = max(tracemalloc.get_traced_memory()[1], registro._pico_hijas)
+                registro.mb_pico = round((pico - base) / 1024 ** 2, 2)
+                if self._abiertas:
+                    self._abiertas[-1]._pico_hijas = max(self._abiertas[-1]._pico_hijas, pico)
+            registro.rss_pico_mb = _rss_pico_mb()
+            self.etapas.append(registro)
+
+    def tabla(self):
+        """DataFrame con una fila por etapa, en el orden en que terminaron."""
+        return pd.DataFrame(
+            [registro.como_dict() for registro in self.etapas],
+            columns=['etapa', 'segundos', 'mb_pico', 'rss_pico_mb', 'filas_entrada', 'filas_salida',
+                     'multiplica_filas'],
+        )
+
+    def cruces_multiplicados(self):
+        return [registro for registro in self.etapas if registro.multiplica_filas]
+
+    def escribir_log(self, ruta):
+        comun = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'ejecucion': self.id,
+            'proceso': self.nombre,
+            'pid': os.getpid(),
+        }
+        lineas = [
+            json.dumps({**comun, **registro.como_dict()}, ensure_ascii=False) for registro in self.etapas
+        ]
+        lineas.append(json.dumps({**comun, 'etapa': 'total', 'segundos': self.segundos}, ensure_ascii=False))
+        ruta = Path(ruta)
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            with _lock_log, ruta.open('a', encoding='utf-8') as archivo:
+                archivo.write('\n'.join(lineas) + '\n')
+        except OSError:
+            # Sin registro no se pierde el resultado del proceso
+            pass
+
+    def informe_cprofile(self, orden='cumulative', lineas=40):
+        """Texto de pstats con las ``lineas`` funciones más costosas (None sin cProfile)."""
+        if self._cprofile is None:
+            return None
+        salida = io.StringIO()
+        pstats.Stats(self._cprofile, stream=salida).sort_stats(orden).print_stats(lineas)
+        return salida.getvalue()
+
+    def datos_cprofile(self):
+        """Bytes en el formato de ``pstats.Stats.dump_stats`` (para ``pstats`` o snakeviz)."""
+        if self._cprofile is None:
+            return None
+        self._cprofile.create_stats()
+        return marshal.dumps(self._cprofile.stats)
+
+
+@contextmanager
+def etapa(nombre, filas_entrada=None, cruce=False):
+    """Mide una etapa si hay un ``Perfil`` activo; si no, no hace nada.
+
+    ``cruce=True`` marca un merge por la izquierda: si ``filas_salida`` supera
+    a ``filas_entrada`` la etapa queda señalada.
+    """
+    registro = Etapa(nombre, filas_entrada, cruce)
+    perfil = _perfil_activo.get()
+    if perfil is None:
+        yield registro
+        return
+    with perfil._medir(registro):
+        yield registro
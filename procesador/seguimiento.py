@@ -0,0 +1,220 @@
+"""Lectura del Excel de seguimiento de ligas (Seguimiento_ligas.xlsm).
+
+El libro tiene macros, varias hojas y decenas de columnas anchas, pero la
+agenda solo usa cuatro columnas de la primera hoja: Competicion (col 1),
+Nombre Club Casa (col 3), Detalles Equipo Casa (col 36) y Visualización C
+(col 37). ``pd.read_excel`` materializa y convierte todas las celdas de cada
+fila antes de descartarlas; ``leer_seguimiento`` recorre el XML de la hoja fila
+a fila en modo solo lectura, convierte únicamente las celdas de esas cuatro
+columnas y salta la cabecera al leer.
+
+Con una hoja de 20.000 filas x 80 columnas de textos compartidos (como las
+escribe Excel) más una segunda hoja: ``leer_seguimiento_read_excel`` ~14 s,
+``leer_seguimiento`` ~5 s. Con textos en línea (openpyxl) ~35 s frente a ~7,5 s.
+
+El recorrido usa piezas internas de openpyxl (``WorkSheetParser`` y atributos
+privados del libro y la hoja). Si una versión de openpyxl las cambia,
+``leer_seguimiento`` vuelve a ``leer_seguimiento_read_excel``: más lento, pero
+con el mismo resultado.
+"""
+
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from pandas.io.parsers import TextParser
+
+try:
+    from openpyxl.worksheet._reader import WorkSheetParser
+except ImportError:  # API interna de openpyxl: puede cambiar de sitio entre versiones
+    WorkSheetParser = None
+
+COLUMNAS_SEGUIMIENTO = ['Competicion', 'Nombre Club Casa', 'Visualización C', 'Detalles Equipo Casa']
+
+# Posición (0-based) en la hoja de cada columna de COLUMNAS_SEGUIMIENTO
+POSICIONES_SEGUIMIENTO = [0, 2, 36, 35]
+
+# Filas sin datos bajo la cabecera. Se leen (solo las 4 columnas) para que la
+# inferencia de tipos sea la misma que con pd.read_excel, y luego se quitan.
+FILAS_DESCARTADAS = 5
+
+_MIN_COLUMNAS = max(POSICIONES_SEGUIMIENTO) + 1
+
+_ROW_TAG = '{%s}row' % SHEET_MAIN_NS
+_VALUE_TAG = '{%s}v' % SHEET_MAIN_NS
+_INLINE_TAG = '{%s}is' % SHEET_MAIN_NS
+
+
+def _error_columnas(num_columnas):
+    return ValueError(
+        f"El Excel de seguimiento tiene {num_columnas} columnas tras quitar las 5 primeras filas; "
+        "se esperaban al menos 37 (Visualización C en col 37, Detalles Equipo Casa en col 36)."
+    )
+
+
+def _convertir_celda(valor):
+    # Misma conversión que hace pandas con openpyxl: vacío -> "", error -> NaN,
+    # y los float enteros pasan a int
+    if valor is None:
+        return ""
+    if isinstance(valor, str) and valor in ERROR_CODES:
+        return np.nan
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _ancho_hoja(fuente):
+    # Número exacto de columnas que vería pandas (solo para el mensaje de error)
+    if hasattr(fuente, 'seek'):
+        fuente.seek(0)
+    libro = load_workbook(fuente, read_only=True, data_only=True, keep_links=False)
+    try:
+        ancho = 0
+        for fila in libro.worksheets[0].iter_rows(values_only=True):
+            for posicion in range(len(fila) - 1, ancho - 1, -1):
+                if fila[posicion] is not None and fila[posicion] != "":
+                    ancho = posicion + 1
+                    break
+        return ancho
+    finally:
+        libro.close()
+
+
+def _tiene_valor(celda):
+    # Sin convertir la celda: ¿tiene un valor (o un texto en línea)?
+    return bool(celda.findtext(_VALUE_TAG)) or celda.find(_INLINE_TAG) is not None
+
+
+def _lector_hoja(libro, hoja):
+    # Parser de celdas de openpyxl y origen del XML de la hoja (API interna de openpyxl)
+    parser = WorkSheetParser(
+        None, hoja._shared_strings, data_only=libro.data_only, epoch=libro.epoch,
+        date_formats=libro._date_formats, timedelta_formats=libro._timedelta_formats,
+    )
+    return parser, hoja._get_source
+
+
+def _filas_hoja(parser, origen, posiciones):
+    """Recorre la hoja de ``origen`` fila a fila convirtiendo solo las columnas de ``posiciones``.
+
+    Devuelve, por fila, los valores de esas columnas (como los daría
+    ``hoja.iter_rows(values_only=True)``) y un ancho: 0 si la fila está vacía,
+    mayor que ``max(posiciones) + 1`` si hay datos más allá de la última
+    columna pedida y, si no, alguna columna con datos. El resto de celdas no
+    pasa por el parser de openpyxl.
+    """
+    indices = {posicion + 1: i for i, posicion in enumerate(posiciones)}
+    max_col = max(indices)
+    fila_vacia = ((None,) * len(posiciones), 0)
+    siguiente = 1
+    numero = 0
+
+    with origen() as src:
+        for _, elemento in iterparse(src):
+            if elemento.tag != _ROW_TAG:
+                continue
+
+            numero = int(elemento.get('r')) if elemento.get('r') else numero + 1
+            if numero < siguiente:
+                elemento.clear()
+                continue
+            # Filas que faltan en el XML se devuelven vacías
+            for _ in range(siguiente, numero):
+                yield fila_vacia
+            siguiente = numero + 1
+
+            valores = [None] * len(posiciones)
+            ancho = 0
+            columna = 0
+            for celda in elemento:
+                coordenada = celda.get('r')
+                if coordenada:
+                    columna = column_index_from_string(coordenada.rstrip('0123456789'))
+                else:
+                    columna += 1
+                if columna in indices:
+                    valor = parser.parse_cell(celda)['value']
+                    valores[indices[columna]] = valor
+                    if valor is not None and valor != "":
+                        ancho = columna
+                # Del resto solo interesa si la fila tiene algún dato y si hay datos
+                # pasada la última columna pedida (las celdas vienen ordenadas)
+                elif (not ancho or columna > max_col) and _tiene_valor(celda):
+                    ancho = columna
+                    if columna > max_col:
+                        break
+            elemento.clear()
+            yield tuple(valores), ancho
+
+
+def leer_seguimiento(fuente):
+    """Lee la tabla de búsqueda de clubes del Excel de seguimiento.
+
+    Devuelve el mismo DataFrame (columnas, valores y tipos) que
+    ``leer_seguimiento_read_excel`` leyendo solo las columnas necesarias.
+    """
+    libro = load_workbook(fuente, read_only=True, data_only=True, keep_links=False)
+    try:
+        try:
+            parser, origen = _lector_hoja(libro, libro.worksheets[0])
+        except (AttributeError, TypeError):
+            # Esta versión de openpyxl no tiene la API interna que se usa aquí
+            # (sin WorkSheetParser, llamarlo da TypeError)
+            parser = origen = None
+        filas = []
+        ultima_con_datos = -1
+        ancho_hoja = 0
+        for numero, (fila, ancho) in enumerate(_filas_hoja(parser, origen, POSICIONES_SEGUIMIENTO) if parser else ()):
+            ancho_hoja = max(ancho_hoja, ancho)
+            # La primera fila es la cabecera
+            if numero == 0:
+                continue
+            # pandas conserva las filas con datos en cualquier columna, no solo en estas cuatro
+            if ancho:
+                ultima_con_datos = len(filas)
+            filas.append([_convertir_celda(valor) for valor in fila])
+    finally:
+        libro.close()
+
+    if parser is None:
+        if hasattr(fuente, 'seek'):
+            fuente.seek(0)
+        return leer_seguimiento_read_excel(fuente)
+
+    if ancho_hoja < _MIN_COLUMNAS:
+        raise _error_columnas(_ancho_hoja(fuente))
+
+    # Filas vacías al final de la hoja: pandas las descarta
+    filas = filas[:ultima_con_datos + 1]
+
+    # Misma inferencia de tipos y valores nulos que pd.read_excel
+    df_seguimiento = TextParser(
+        filas, names=COLUMNAS_SEGUIMIENTO, header=None, skip_blank_lines=False
+    ).read()
+    return df_seguimiento.drop(index=df_seguimiento.index[:FILAS_DESCARTADAS])
+
+
+def leer_seguimiento_read_excel(fuente):
+    """Lectura completa con ``pd.read_excel`` (implementación de referencia)."""
+    lect_seguimiento = pd.read_excel(fuente)
+
+    # Eliminar las primeras 5 filas
+    df_seguimiento = lect_seguimiento.drop(index=lect_seguimiento.index[:FILAS_DESCARTADAS])
+
+    # Renombrar columnas relevantes (por posición; reasignar la lista entera para compatibilidad con pandas 2.x)
+    new_cols = df_seguimiento.columns.tolist()
+    if len(new_cols) <= 36:
+        raise _error_columnas(len(new_cols))
+    new_cols[0] = 'Competicion'
+    new_cols[2] = 'Nombre Club Casa'
+    new_cols[35] = 'Detalles Equipo Casa'
+    new_cols[36] = 'Visualización C'
+    df_seguimiento.columns = new_cols
+
+    # Seleccionar columnas necesarias
+    return df_seguimiento[COLUMNAS_SEGUIMIENTO]
@@ -0,0 +1,160 @@
+"""Ejecución de procesos en segundo plano con identificador, progreso y cancelación.
+
+Streamlit ejecuta el script en el hilo de la sesión: un proceso largo bloquea
+la página y cualquier cambio en un widget lo vuelve a empezar. Aquí cada
+proceso se envía a un pool de hilos compartido por todas las sesiones (la
+caché de contenido también se comparte), recibe un ``id`` y la página solo
+consulta su estado en cada ejecución del script.
+
+El progreso sale de las etapas marcadas con ``rendimiento.etapa``: cada
+trabajo se ejecuta dentro de un ``Perfil`` que avisa al empezar cada etapa. La
+cancelación es cooperativa: se comprueba al empezar cada etapa y cada vez que
+el proceso llama a ``Trabajo.avanzar``.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from procesador.rendimiento import Perfil
+
+EN_COLA = 'en_cola'
+EN_CURSO = 'en_curso'
+TERMINADO = 'terminado'
+ERROR = 'error'
+CANCELADO = 'cancelado'
+
+ESTADOS_FINALES = (TERMINADO, ERROR, CANCELADO)
+
+
+class TrabajoCancelado(Exception):
+    """El usuario ha cancelado el trabajo."""
+
+
+class Trabajo:
+    """Estado de un trabajo enviado a ``GestorTrabajos``.
+
+    ``funcion(trabajo, *args)`` devuelve el resultado, que queda en
+    ``resultado``; si falla, el mensaje queda en ``error``. ``etapas`` son los
+    nombres de etapa previstos, en orden, para calcular el progreso.
+    """
+
+    def __init__(self, nombre, clave=None, etapas=(), cprofile=False, memoria=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.nombre = nombre
+        self.clave = clave
+        self.etapas = list(etapas)
+        self.cprofile = cprofile
+        self.memoria = memoria
+        self.estado = EN_COLA
+        self.progreso = 0.0
+        self.mensaje = "En cola..."
+        self.resultado = None
+        self.error = None
+        self.perfil = None
+        self.creado = time.time()
+        self.terminado_en = None
+        self._cancelar = threading.Event()
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_FINALES
+
+    def cancelar(self):
+        self._cancelar.set()
+        if self.estado == EN_COLA:
+            self.mensaje = "Cancelando..."
+
+    def avanzar(self, progreso=None, mensaje=None):
+        """Actualiza progreso (0-1) y mensaje; lanza ``TrabajoCancelado`` si se ha cancelado."""
+        if self._cancelar.is_set():
+            raise TrabajoCancelado()
+        if progreso is not None:
+            self.progreso = max(0.0, min(float(progreso), 1.0))
+        if mensaje is not None:
+            self.mensaje = mensaje
+
+    def _al_iniciar_etapa(self, nombre):
+        progreso = None
+        if nombre in self.etapas:
+            progreso = max(self.progreso, self.etapas.index(nombre) / len(self.etapas))
+        self.avanzar(progreso, f"Etapa: {nombre}...")
+
+
+class GestorTrabajos:
+    """Pool de hilos compartido con el registro de trabajos por ``id``.
+
+    Los trabajos terminados se quedan en el registro hasta que alguien los
+    retira con ``retirar`` (o caducan con ``limpiar``).
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='procesador')
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def enviar(self, nombre, funcion, *args, clave=None, etapas=(), cprofile=False, memoria=False):
+        """Encola ``funcion(trabajo, *args)`` y devuelve el ``Trabajo``.
+
+        ``cprofile`` y ``memoria`` (tracemalloc) se pasan al ``Perfil`` del trabajo.
+        """
+        trabajo = Trabajo(nombre, clave, etapas, cprofile, memoria)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+        self._pool.submit(self._ejecutar, trabajo, funcion, args)
+        return trabajo
+
+    def _ejecutar(self, trabajo, funcion, args):
+        try:
+            trabajo.avanzar(0.0, "Empezando...")
+            trabajo.estado = EN_CURSO
+            perfil = Perfil(trabajo.nombre, memoria=trabajo.memoria, cprofile=trabajo.cprofile,
+                            al_iniciar_etapa=trabajo._al_iniciar_etapa)
+            trabajo.perfil = perfil
+            with perfil:
+                resultado = funcion(trabajo, *args)
+            trabajo.resultado = resultado
+            trabajo.progreso = 1.0
+            trabajo.mensaje = "Terminado"
+            trabajo.estado = TERMINADO
+        except TrabajoCancelado:
+            trabajo.mensaje = "Cancelado"
+            trabajo.estado = CANCELADO
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.mensaje = "Error"
+            trabajo.estado = ERROR
+        finally:
+            trabajo.terminado_en = time.time()
+
+    def obtener(self, id_trabajo):
+        if id_trabajo is None:
+            return None
+        with self._lock:
+            return self._trabajos.get(id_trabajo)
+
+    def retirar(self, id_trabajo):
+        with self._lock:
+            return self._trabajos.pop(id_trabajo, None)
+
+    def limpiar(self, antiguedad=3600):
+        """Olvida los trabajos terminados hace más de ``antiguedad`` segundos."""
+        limite = time.time() - antiguedad
+        with self._lock:
+            for id_trabajo in [
+                id_trabajo for id_trabajo, trabajo in self._trabajos.items()
+                if trabajo.terminado and trabajo.terminado_en < limite
+            ]:
+                del self._trabajos[id_trabajo]
+
+    def estadisticas(self):
+        with self._lock:
+            trabajos = list(self._trabajos.values())
+        return {
+            'en_cola': sum(trabajo.estado == EN_COLA for trabajo in trabajos),
+            'en_curso': sum(trabajo.estado == EN_CURSO for trabajo in trabajos),
+            'workers': self.max_workers,
+        }
@@ -0,0 +1,83 @@
+"""Versiones del almacén de agendas: reconstrucción, trozos y escrituras en conflicto."""
+
+import pandas as pd
+import pytest
+
+from procesador.almacen import AlmacenAgendas
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenAgendas(tmp_path / 'agendas.sqlite')
+
+
+def _agenda():
+    return pd.DataFrame({
+        'Competicion': ['Liga A', 'Liga A', 'Liga B'],
+        'Jornada': [1, 2, 1],
+        'Nombre Club Casa': ['Casa 1', 'Casa 2', 'Casa 3'],
+        'Nombre Club Visitante': ['Fuera 1', 'Fuera 2', 'Fuera 3'],
+        'Hora': ['10:00', '11:00', '12:00'],
+        'Técnico': ['Ana', None, 'Luis'],
+    })
+
+
+def test_guardar_actualizar_y_recuperar_version_anterior(almacen):
+    original = _agenda()
+    assert almacen.guardar('liga', original) == 1
+
+    nueva = original.copy()
+    nueva.loc[1, 'Hora'] = '17:00'
+    _, stats, version = almacen.actualizar('liga', nueva, ['Hora'])
+    assert version == 2
+    assert stats['partidos_actualizados'] == 1
+    assert set(almacen.cambios('liga', 2)['columna']) == {'Hora', 'Ultima_Actualizacion'}
+
+    # Un cambio en Excel (técnico asignado) es otra versión
+    editada = almacen.cargar('liga').reset_index(drop=True)
+    editada.loc[1, 'Técnico'] = 'Marta'
+    assert almacen.guardar('liga', editada) == 3
+
+    # La versión 1 sale como se guardó, sin la columna que apareció después
+    pd.testing.assert_frame_equal(almacen.cargar('liga', 1).reset_index(drop=True), original)
+    assert almacen.cargar('liga', 2).loc[1, 'Hora'] == '17:00'
+    assert pd.isna(almacen.cargar('liga', 2).loc[1, 'Técnico'])
+    assert almacen.cargar('liga').loc[1, 'Técnico'] == 'Marta'
+
+
+def test_actualizar_sin_cambios_no_crea_version(almacen):
+    almacen.guardar('liga', _agenda())
+    _, _, version = almacen.actualizar('liga', _agenda(), ['Hora'])
+    assert version is None
+    assert almacen.version_actual('liga') == 1
+
+
+def test_trozo_de_version_anterior_por_sus_propios_valores(almacen):
+    original = _agenda()
+    almacen.guardar('liga', original)
+    # Después, el partido 0 pasa a la Liga B y el 2 a la jornada 3
+    movida = original.copy()
+    movida.loc[0, 'Competicion'] = 'Liga B'
+    movida.loc[2, 'Jornada'] = 3
+    almacen.guardar('liga', movida)
+
+    assert almacen.cargar('liga', 1, competicion='Liga A').index.tolist() == [0, 1]
+    assert almacen.cargar('liga', 1, competicion='Liga B', jornada=1).index.tolist() == [2]
+    assert almacen.cargar('liga', 1, jornada=3).empty
+    assert almacen.cargar('liga', 1, competicion='Liga A').loc[0, 'Competicion'] == 'Liga A'
+    # La versión actual se filtra por los valores actuales
+    assert almacen.cargar('liga', competicion='Liga B').index.tolist() == [0, 2]
+    assert almacen.cargar('liga', jornada=3).index.tolist() == [2]
+
+
+def test_escrituras_en_conflicto(almacen):
+    almacen.guardar('liga', _agenda())
+    # Dos procesos parten de la versión 1; el segundo en escribir debe reintentar
+    primera = _agenda().assign(Hora='18:00')
+    segunda = _agenda().assign(Hora='19:00')
+    assert almacen._nueva_version('liga', 1, primera, [(0, 'Hora', '10:00', '18:00')], 'primera') == 2
+    with pytest.raises(RuntimeError, match='ha cambiado'):
+        almacen._nueva_version('liga', 1, segunda, [(0, 'Hora', '10:00', '19:00')], 'segunda')
+    assert almacen.version_actual('liga') == 2
+    assert almacen.cargar('liga').loc[0, 'Hora'] == '18:00'
+    assert almacen.historial('liga')['descripcion'].tolist()[-1] == 'primera'
@@ -0,0 +1,58 @@
+"""La caché calcula una sola vez cada clave aunque la pidan varios hilos a la vez."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from procesador.cache import CacheContenido
+
+HILOS = 8
+
+
+def _pedir_a_la_vez(cache, calcular):
+    # Todos los hilos llaman a ``obtener`` a la vez, con el primer cálculo aún en marcha
+    barrera = threading.Barrier(HILOS)
+
+    def pedir(_):
+        barrera.wait()
+        try:
+            return cache.obtener('libro', calcular)
+        except ValueError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(HILOS) as pool:
+        return list(pool.map(pedir, range(HILOS)))
+
+
+def test_claves_pedidas_a_la_vez_se_calculan_una_vez():
+    cache = CacheContenido()
+    llamadas = []
+    liberar = threading.Event()
+
+    def calcular():
+        llamadas.append(1)
+        liberar.wait(5)
+        return b'datos'
+
+    temporizador = threading.Timer(0.2, liberar.set)
+    temporizador.start()
+    assert _pedir_a_la_vez(cache, calcular) == [b'datos'] * HILOS
+    assert len(llamadas) == 1
+    assert cache.estadisticas()['fallos'] == 1
+    assert cache.estadisticas()['aciertos'] == HILOS - 1
+
+
+def test_si_el_primer_calculo_falla_otro_lo_reintenta():
+    cache = CacheContenido()
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            threading.Event().wait(0.2)
+            raise ValueError('fallo')
+        return b'datos'
+
+    resultados = _pedir_a_la_vez(cache, calcular)
+    assert resultados.count('fallo') == 1
+    assert resultados.count(b'datos') == HILOS - 1
+    assert len(llamadas) == 2
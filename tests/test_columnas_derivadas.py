@@ -0,0 +1,75 @@
+"""La regla de "Visto" por columnas da lo mismo que la función fila a fila original."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from procesador.columnas_derivadas import calcular_visto, celda_rellena, recalcular_derivadas
+
+
+def calcular_visto_fila(row):
+    # Regla original de app.py, aplicada con df.apply(..., axis=1)
+    vis_c = row.get('Visualización C', '')
+    vis_v = row.get('Visualización V', '')
+
+    vis_c_str = str(vis_c) if pd.notna(vis_c) else ''
+    vis_v_str = str(vis_v) if pd.notna(vis_v) else ''
+
+    if vis_c_str != '' and vis_v_str != '':
+        return 'Rellenas'
+    else:
+        return 'Incompletas'
+
+
+# Casos límite: vacíos de varios tipos, cero y espacios (no son vacíos en Excel)
+VALORES = [np.nan, None, '', 0, ' ', '  ', 'Sí', 'x', 0.0, 1]
+VALORES_TEXTO = [np.nan, None, '', ' ', '  ', 'Sí', 'x', '0']
+
+
+def _todas_las_parejas(valores):
+    parejas = [(c, v) for c in valores for v in valores]
+    return pd.DataFrame({
+        'Visualización C': pd.Series([c for c, _ in parejas], dtype=object),
+        'Visualización V': pd.Series([v for _, v in parejas], dtype=object),
+    })
+
+
+def _esperado(df):
+    return df.apply(calcular_visto_fila, axis=1).tolist()
+
+
+def test_visto_igual_que_fila_a_fila_con_object():
+    df = _todas_las_parejas(VALORES)
+    assert calcular_visto(df).tolist() == _esperado(df)
+
+
+@pytest.mark.parametrize('tipo', ['category', 'string', 'string[pyarrow]'])
+def test_visto_igual_que_fila_a_fila_con_columnas_tipadas(tipo):
+    df = _todas_las_parejas(VALORES_TEXTO)
+    esperado = _esperado(df)
+    tipado = df.astype(tipo)
+    assert calcular_visto(tipado).tolist() == esperado
+
+
+@pytest.mark.parametrize('valores, esperado', [
+    ([np.nan, None, '', 0, ' ', 'x'], [False, False, False, True, True, True]),
+    ([np.nan, 0.0, 1.5], [False, True, True]),
+])
+def test_celda_rellena(valores, esperado):
+    serie = pd.Series(valores, dtype=object if isinstance(valores[-1], str) else float)
+    assert celda_rellena(serie).tolist() == esperado
+
+
+def test_columna_que_falta_cuenta_como_vacia():
+    df = pd.DataFrame({'Visualización C': ['x', 'y']})
+    assert calcular_visto(df).tolist() == ['Incompletas', 'Incompletas']
+
+
+def test_recalcular_solo_filas_indicadas():
+    df = pd.DataFrame({
+        'Visualización C': ['x', 'x', ''],
+        'Visualización V': ['y', 'y', 'y'],
+        'Visto': ['antes', 'antes', 'antes'],
+    }, index=[10, 20, 30])
+    recalcular_derivadas(df, np.array([False, True, True]))
+    assert df['Visto'].tolist() == ['antes', 'Rellenas', 'Incompletas']
@@ -0,0 +1,103 @@
+"""Emparejamiento de partidos por clave compuesta y aproximado por bloque."""
+
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from procesador.actualizacion import actualizar_agenda
+from procesador.emparejamiento import CLAVE_PARTIDO, UMBRAL_APROXIMADO, claves_compuestas, emparejar_aproximado
+
+
+def _agenda(filas, **extra):
+    df = pd.DataFrame(filas, columns=CLAVE_PARTIDO)
+    for columna, valores in extra.items():
+        df[columna] = valores
+    return df
+
+
+def _aproximado(df_martes, df_miercoles, **opciones):
+    origen, destino = emparejar_aproximado(
+        df_martes, df_miercoles, np.arange(len(df_martes)), np.arange(len(df_miercoles)), **opciones
+    )
+    return sorted(zip(origen.tolist(), destino.tolist()))
+
+
+def test_aproximado_solo_dentro_del_bloque():
+    df_martes = _agenda([
+        ('Liga A', 1, 'C.D. Alcala', 'U.D. Ecija'),
+        ('Liga A', 2, 'C.D. Alcala', 'U.D. Ecija'),
+    ])
+    df_miercoles = _agenda([
+        ('Liga A', 2, 'C.D. Alcalá', 'U.D. Écija'),
+        ('Liga B', 1, 'C.D. Alcalá', 'U.D. Écija'),
+    ])
+    # La fila de la jornada 2 va con la de su jornada; la de otra competición se queda sin pareja
+    assert _aproximado(df_martes, df_miercoles) == [(0, 1)]
+
+
+def test_aproximado_prefiere_la_pareja_mas_parecida():
+    df_martes = _agenda([
+        ('Liga A', 1, 'C.D. Alcala', 'U.D. Ecija'),
+        ('Liga A', 1, 'C.D. Alcalá', 'U.D. Écija'),
+    ])
+    df_miercoles = _agenda([('Liga A', 1, 'C.D. Alcalá', 'U.D. Écija')])
+    assert _aproximado(df_martes, df_miercoles) == [(0, 1)]
+
+
+@pytest.mark.parametrize('visitante', ['U.D. Écija', 'U.D. Ecija', 'U.D. Écija B', 'Real Écija', 'C.F. Utrera'])
+def test_umbral_aproximado(visitante):
+    df_martes = _agenda([('Liga A', 1, 'C.D. Alcalá', 'U.D. Écija')])
+    df_miercoles = _agenda([('Liga A', 1, 'C.D. Alcalá', visitante)])
+    parecido = SequenceMatcher(None, 'c.d. alcalá | u.d. écija', f'c.d. alcalá | {visitante.lower()}').ratio()
+    esperado = [(0, 0)] if parecido >= UMBRAL_APROXIMADO else []
+    assert _aproximado(df_martes, df_miercoles) == esperado
+    # Con el umbral justo en el parecido se acepta; un poco por encima, no
+    assert _aproximado(df_martes, df_miercoles, umbral=parecido) == [(0, 0)]
+    assert _aproximado(df_martes, df_miercoles, umbral=min(parecido + 0.01, 1.01)) == []
+
+
+def test_umbral_separa_casos_reales():
+    df_martes = _agenda([('Liga A', 1, 'C.D. Alcalá', 'U.D. Écija'), ('Liga A', 1, 'Atlético Morón', 'Peña Osuna')])
+    df_miercoles = _agenda([('Liga A', 1, 'C.D. Alcala', 'U.D. Ecija'), ('Liga A', 1, 'C.F. Utrera', 'Real Lepe')])
+    assert _aproximado(df_martes, df_miercoles) == [(0, 0)]
+
+
+def test_claves_con_jornada_entera_o_float():
+    filas = [('Liga A', 1, 'Casa', 'Fuera'), ('Liga A', 2, 'Casa', 'Otro')]
+    enteros = _agenda(filas)
+    flotantes = enteros.astype({'Jornada': float})
+    textos = enteros.astype({'Jornada': str})
+    categorias = flotantes.astype({'Jornada': 'category'})
+    objetos = flotantes.astype({'Jornada': object})
+    esperado = claves_compuestas(enteros, CLAVE_PARTIDO)
+    for df in (flotantes, textos, categorias, objetos):
+        assert (claves_compuestas(df, CLAVE_PARTIDO) == esperado).all()
+    # Un NaN no se confunde con ninguna jornada
+    con_vacio = flotantes.copy()
+    con_vacio.loc[0, 'Jornada'] = np.nan
+    assert claves_compuestas(con_vacio, CLAVE_PARTIDO)[0] != esperado[0]
+
+
+def test_actualizar_con_jornada_float_empareja_por_clave():
+    df_martes = _agenda([('Liga A', 1, 'Casa', 'Fuera'), ('Liga A', 2, 'Casa', 'Otro')], Hora=['10:00', '11:00'])
+    # Como llega de Excel con una celda vacía en la columna: jornadas como float, y en otro orden
+    df_miercoles = _agenda([('Liga A', 2.0, 'Casa', 'Otro'), ('Liga A', 1.0, 'Casa', 'Fuera')],
+                           Hora=['12:00', '10:00'])
+    df, stats = actualizar_agenda(df_martes, df_miercoles, ['Hora'], CLAVE_PARTIDO)
+    assert df['Hora'].tolist() == ['10:00', '12:00']
+    assert stats['coincidencias_por_estrategia']['clave_compuesta'] == 2
+    assert stats['partidos_sin_match'] == 0
+
+
+def test_claves_repetidas_se_emparejan_por_orden_de_aparicion():
+    # Dos partidos con la misma clave (p. ej. un aplazado que se juega la misma jornada)
+    repetido = ('Liga A', 1, 'Casa', 'Fuera')
+    df_martes = _agenda([repetido, ('Liga A', 1, 'Otro', 'Más'), repetido], Hora=['9:00', '11:00', '13:00'])
+    df_miercoles = _agenda([repetido, repetido, ('Liga A', 1, 'Otro', 'Más')], Hora=['9:30', '13:30', '11:00'])
+    df, stats = actualizar_agenda(df_martes, df_miercoles, ['Hora'], CLAVE_PARTIDO)
+    # El primero con el primero y el segundo con el segundo: ninguno se pierde
+    assert df['Hora'].tolist() == ['9:30', '11:00', '13:30']
+    assert stats['partidos_actualizados'] == 2
+    assert stats['claves_repetidas'] == {'actual': 1, 'nueva': 1}
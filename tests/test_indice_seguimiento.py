@@ -0,0 +1,43 @@
+"""El índice de seguimiento se puede cargar a la vez desde varios hilos."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from benchmarks.generadores import generar_seguimiento
+from procesador.combinacion import sin_repetidos
+from procesador.indice_seguimiento import cargar_indice
+
+HILOS = 4
+
+
+@pytest.fixture(scope='module')
+def libro():
+    return generar_seguimiento(2_000)
+
+
+@pytest.mark.parametrize('ronda', range(5))
+def test_cargar_indice_a_la_vez_sobre_el_mismo_libro(libro, tmp_path, ronda):
+    # Todos construyen el índice a la vez: ninguno debe pisar el temporal de otro
+    barrera = threading.Barrier(HILOS)
+
+    def cargar(_):
+        barrera.wait()
+        return cargar_indice(libro, tmp_path)
+
+    with ThreadPoolExecutor(HILOS) as pool:
+        resultados = list(pool.map(cargar, range(HILOS)))
+
+    for df_seguimiento, duplicados in resultados:
+        pd.testing.assert_frame_equal(df_seguimiento, resultados[0][0])
+        assert len(duplicados) == len(resultados[0][1])
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_sin_repetidos_por_contenido():
+    archivos = [('a.xlsm', b'1', 'h1'), ('b.xlsm', b'2', 'h2'), ('copia de a.xlsm', b'1', 'h1')]
+    unicos, repetidos = sin_repetidos(archivos)
+    assert unicos == archivos[:2]
+    assert repetidos == ['copia de a.xlsm']